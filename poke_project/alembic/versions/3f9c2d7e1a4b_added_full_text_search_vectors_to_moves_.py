@@ -0,0 +1,44 @@
+"""added full text search vectors to moves and items
+
+Revision ID: 3f9c2d7e1a4b
+Revises: a25792002d38
+Create Date: 2026-10-18 10:12:41.503117
+
+"""
+from typing import Sequence
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2d7e1a4b'
+down_revision: str | None = 'a25792002d38'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # Generated columns keep the vectors in sync with name/description without triggers
+    op.add_column('moves', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed("to_tsvector('english', coalesce(name, '') || ' ' || coalesce(description, ''))", persisted=True),
+        nullable=True
+    ))
+    op.add_column('items', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed("to_tsvector('english', coalesce(name, '') || ' ' || coalesce(description, ''))", persisted=True),
+        nullable=True
+    ))
+    op.create_index('ix_moves_search_vector', 'moves', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index('ix_items_search_vector', 'items', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_items_search_vector', table_name='items', postgresql_using='gin')
+    op.drop_index('ix_moves_search_vector', table_name='moves', postgresql_using='gin')
+    op.drop_column('items', 'search_vector')
+    op.drop_column('moves', 'search_vector')
@@ -0,0 +1,52 @@
+"""added missing indexes for hot lookups
+
+Revision ID: c5e1a7d93f28
+Revises: b4d8e6f21c93
+Create Date: 2026-10-18 14:22:51.406127
+
+"""
+from typing import Sequence
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e1a7d93f28'
+down_revision: str | None = 'b4d8e6f21c93'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # Item names were never unique, so point team members at the oldest copy and drop the rest first
+    op.execute("""
+        UPDATE team_members SET item_id = keep.id
+        FROM items duplicate
+        JOIN (SELECT name, MIN(id) AS id FROM items GROUP BY name) keep ON keep.name = duplicate.name
+        WHERE team_members.item_id = duplicate.id AND duplicate.id <> keep.id
+    """)
+    op.execute("DELETE FROM items WHERE id NOT IN (SELECT MIN(id) FROM items GROUP BY name)")
+
+    op.create_index(op.f('ix_items_name'), 'items', ['name'], unique=True)
+    op.create_index(op.f('ix_moves_move_type'), 'moves', ['move_type'], unique=False)
+    op.create_index(op.f('ix_moves_category'), 'moves', ['category'], unique=False)
+    op.create_index(op.f('ix_links_move_name'), 'links', ['move_name'], unique=False)
+    op.create_index(op.f('ix_team_members_team_id'), 'team_members', ['team_id'], unique=False)
+    op.create_index(op.f('ix_team_members_pokemon_id'), 'team_members', ['pokemon_id'], unique=False)
+    op.create_index(op.f('ix_team_members_item_id'), 'team_members', ['item_id'], unique=False)
+    op.create_index(op.f('ix_team_member_moves_team_member_id'), 'team_member_moves', ['team_member_id'], unique=False)
+    op.create_index(op.f('ix_team_member_moves_move_name'), 'team_member_moves', ['move_name'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_team_member_moves_move_name'), table_name='team_member_moves')
+    op.drop_index(op.f('ix_team_member_moves_team_member_id'), table_name='team_member_moves')
+    op.drop_index(op.f('ix_team_members_item_id'), table_name='team_members')
+    op.drop_index(op.f('ix_team_members_pokemon_id'), table_name='team_members')
+    op.drop_index(op.f('ix_team_members_team_id'), table_name='team_members')
+    op.drop_index(op.f('ix_links_move_name'), table_name='links')
+    op.drop_index(op.f('ix_moves_category'), table_name='moves')
+    op.drop_index(op.f('ix_moves_move_type'), table_name='moves')
+    op.drop_index(op.f('ix_items_name'), table_name='items')
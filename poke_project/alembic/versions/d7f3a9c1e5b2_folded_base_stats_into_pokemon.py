@@ -0,0 +1,62 @@
+"""folded base stats into pokemon
+
+Revision ID: d7f3a9c1e5b2
+Revises: c5e1a7d93f28
+Create Date: 2026-10-18 23:10:42.518306
+
+"""
+from typing import Sequence
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7f3a9c1e5b2'
+down_revision: str | None = 'c5e1a7d93f28'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+STAT_COLUMNS = ['hp', 'atk', 'def_', 'spa', 'spd', 'spe']
+
+
+def upgrade() -> None:
+    for column in STAT_COLUMNS:
+        op.add_column('pokemon', sa.Column(column, sa.Integer(), nullable=True))
+    op.execute(f"""
+        UPDATE pokemon SET {', '.join(f'{column} = stats.{column}' for column in STAT_COLUMNS)}
+        FROM stats WHERE stats.id = pokemon.base_stats_id
+    """)
+    # Added after the backfill so the table is only rewritten once to fill it in
+    op.add_column('pokemon', sa.Column('total', sa.Integer(), sa.Computed('hp + atk + def_ + spa + spd + spe', persisted=True),
+                                       nullable=True))
+    # Dropping the column drops its foreign key with it
+    op.drop_column('pokemon', 'base_stats_id')
+    op.drop_table('stats')
+
+
+def downgrade() -> None:
+    op.create_table('stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('hp', sa.Integer(), nullable=False),
+    sa.Column('atk', sa.Integer(), nullable=False),
+    sa.Column('def_', sa.Integer(), nullable=False),
+    sa.Column('spa', sa.Integer(), nullable=False),
+    sa.Column('spd', sa.Integer(), nullable=False),
+    sa.Column('spe', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # One stats row per Pokémon, reusing its natdex id as the stats id
+    op.execute(f"""
+        INSERT INTO stats (id, {', '.join(STAT_COLUMNS)}, total)
+        SELECT natdex_id, {', '.join(STAT_COLUMNS)}, total FROM pokemon WHERE hp IS NOT NULL
+    """)
+    op.execute("SELECT setval(pg_get_serial_sequence('stats', 'id'), COALESCE((SELECT MAX(id) FROM stats), 0) + 1, false)")
+    op.add_column('pokemon', sa.Column('base_stats_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('pokemon_base_stats_id_fkey', 'pokemon', 'stats', ['base_stats_id'], ['id'])
+    op.execute("UPDATE pokemon SET base_stats_id = natdex_id WHERE hp IS NOT NULL")
+    op.drop_column('pokemon', 'total')
+    for column in reversed(STAT_COLUMNS):
+        op.drop_column('pokemon', column)
@@ -0,0 +1,30 @@
+"""added leases to ingestion jobs
+
+Revision ID: e2b7c4d8a913
+Revises: d7f3a9c1e5b2
+Create Date: 2026-10-19 09:12:37.604219
+
+"""
+from typing import Sequence
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b7c4d8a913'
+down_revision: str | None = 'd7f3a9c1e5b2'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column('ingestion_jobs', sa.Column('owner', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column('ingestion_jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+    # Running jobs from before leases have no heartbeat, so the first process to start requeues them
+
+
+def downgrade() -> None:
+    op.drop_column('ingestion_jobs', 'heartbeat_at')
+    op.drop_column('ingestion_jobs', 'owner')
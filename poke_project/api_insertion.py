@@ -1,39 +1,187 @@
-import requests
+import hashlib
+import json
 import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
-from models import Pokemon, Item, Moves, Links, Stats
-
-main_url = "https://pokeapi.co/api/v2/"
+from models import Pokemon, Item, Moves, Links, UpstreamSync
+from upstream import client, POOL_SIZE
+from name_index import name_index
+from team_validator import validator
+from json_cache import fragment_cache
+from text_search import text_index
+from shared_cache import bus
+from recommender import candidate_pool
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Callbacks run as listener(kind, name) whenever a Pokémon, move or item row is inserted, in this worker or another
+reference_listeners = [name_index.add, validator.invalidate, fragment_cache.invalidate, text_index.invalidate,
+                       candidate_pool.invalidate]
+
+REFERENCE_KINDS = ('pokemon', 'move', 'item')
+
+def _run_reference_listeners(kind, name):
+    if kind in REFERENCE_KINDS:
+        for listener in reference_listeners:
+            listener(kind, name)
+
+bus.subscribe(_run_reference_listeners)
+
+def notify_reference_change(kind, name):
+    # The bus runs the listeners here and broadcasts the change to the other workers
+    bus.publish(kind, name)
+
 def fetch_data(endpoint, name):
-    response = requests.get(f'{main_url}/{endpoint}/{name}')
-    if response.status_code == 200:
-        return response.json()
+    response = client.get(endpoint, name)
+    if response:
+        return response.data
     else:
-        logger.error(f"Failed to fetch {endpoint} data for {name}. Status code: {response.status_code}")
+        logger.error(f"Failed to fetch {endpoint} data for {name}")
         return None
 
+def fetch_many(endpoint, names):
+    """Fetch several resources concurrently over the pooled upstream session. Returns {name: data or None}."""
+    if not names:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(POOL_SIZE, len(names))) as executor:
+        return dict(zip(names, executor.map(lambda name: fetch_data(endpoint, name), names)))
+
+# ----- UPSTREAM TO ROW MAPPING -----
+
+def move_fields(move_data):
+    return {
+        'name': move_data['name'].replace('-', ' '),
+        'move_type': move_data.get('type', {}).get('name'),
+        'category': move_data.get('damage_class', {}).get('name'),
+        'power': move_data.get('power'),
+        'accuracy': move_data.get('accuracy'),
+        'description': move_data['effect_entries'][0]['short_effect'] if move_data['effect_entries'] else ''
+    }
+
+def stats_fields(pokemon_data):
+    return {
+        'hp': pokemon_data['stats'][0]['base_stat'],
+        'atk': pokemon_data['stats'][1]['base_stat'],
+        'def_': pokemon_data['stats'][2]['base_stat'],
+        'spa': pokemon_data['stats'][3]['base_stat'],
+        'spd': pokemon_data['stats'][4]['base_stat'],
+        'spe': pokemon_data['stats'][5]['base_stat'],
+        'total': sum(stat['base_stat'] for stat in pokemon_data['stats'])
+    }
+
+def stat_columns(pokemon_data):
+    # total is generated by the database from the other six
+    return {key: value for key, value in stats_fields(pokemon_data).items() if key != 'total'}
+
+def learnset(pokemon_data):
+    """Row names of the moves the Pokémon learns, sorted so the content hash doesn't depend on upstream order."""
+    return sorted({move['move']['name'].replace('-', ' ') for move in pokemon_data['moves']})
+
+def pokemon_sync_fields(pokemon_data):
+    # Everything refresh rewrites for a Pokémon, so a changed learnset counts as a change
+    return {**pokemon_fields(pokemon_data), **stats_fields(pokemon_data), 'moves': learnset(pokemon_data)}
+
+def pokemon_fields(pokemon_data):
+    return {
+        'natdex_id': pokemon_data['id'],
+        'name': pokemon_data['name'].replace('-', ' '),
+        'pokemon_type': "/".join([t['type']['name'] for t in pokemon_data['types']]),
+        'abilities': "/".join([a['ability']['name'].replace('-', ' ') for a in pokemon_data['abilities']])
+    }
+
+def item_fields(item_data):
+    return {
+        'id': item_data['id'],
+        'name': item_data['name'].replace('-', ' '),
+        'description': item_data['effect_entries'][0]['short_effect'] if item_data['effect_entries'] else ''
+    }
+
+def content_hash(fields):
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+def utcnow():
+    # The timestamp columns are timestamp without time zone, so store naive UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def record_sync(db: Session, kind, name, upstream_name, fields):
+    """Stage the upstream bookkeeping row used by the refresh worker. Committed with the caller's row."""
+    entry = client.cache.get_entry(client.url_for(kind, upstream_name)) or {}
+    now = utcnow()
+    db.merge(UpstreamSync(
+        kind=kind,
+        name=name,
+        upstream_name=upstream_name,
+        content_hash=content_hash(fields),
+        etag=entry.get('etag'),
+        last_modified=entry.get('last_modified'),
+        fetched_at=now,
+        checked_at=now
+    ))
+
+# ----- INGESTION PLANNING -----
+
+@dataclass
+class IngestionPlan:
+    """What ingesting a Pokémon will cost, worked out before any move is fetched."""
+    pokemon: str
+    pokemon_exists: bool
+    known_moves: list[str] = field(default_factory=list)  # Row names already in the moves table
+    missing_moves: list[str] = field(default_factory=list)  # Upstream names that still have to be fetched
+
+    @property
+    def fetches(self):
+        return len(self.missing_moves)
+
+    @property
+    def inserts(self):
+        if self.pokemon_exists:
+            return 0
+        # The Pokémon row (stats included), the missing moves, one link per learnable move, and the
+        # upstream_sync rows record_sync writes for the Pokémon and each fetched move
+        return 2 + 3 * len(self.missing_moves) + len(self.known_moves)
+
+    def report(self):
+        return {
+            'pokemon': self.pokemon,
+            'pokemon_exists': self.pokemon_exists,
+            'known_moves': self.known_moves,
+            'missing_moves': self.missing_moves,
+            'fetches': self.fetches,
+            'inserts': self.inserts
+        }
+
+def plan_pokemon(pokemon_data, db: Session):
+    """Diff the Pokémon's learnable moves against the moves table in a single query."""
+    name = pokemon_data['name'].replace('-', ' ')
+    exists = db.exec(select(Pokemon.name).where(Pokemon.name == name)).first() is not None
+    learnable = {move['move']['name']: move['move']['name'].replace('-', ' ') for move in pokemon_data['moves']}
+    known = set(db.exec(select(Moves.name).where(Moves.name.in_(list(learnable.values())))).all()) if learnable else set()
+    return IngestionPlan(
+        pokemon=name,
+        pokemon_exists=exists,
+        known_moves=sorted(known),
+        missing_moves=[] if exists else sorted(upstream for upstream, row in learnable.items() if row not in known)
+    )
+
+# ----- INSERTS -----
+
 def insert_move(move_data, db: Session):
     formatted_name = move_data['name'].replace('-', ' ')
     move_db = db.exec(select(Moves).where(Moves.name == formatted_name)).first()
     if not move_db:
-        move_db = Moves(
-            name=formatted_name,
-            move_type=move_data.get('type', {}).get('name'),
-            category=move_data.get('damage_class', {}).get('name'),
-            power=move_data.get('power'),
-            accuracy=move_data.get('accuracy'),
-            description=move_data['effect_entries'][0]['short_effect'] if move_data['effect_entries'] else ''
-        )
+        fields = move_fields(move_data)
+        move_db = Moves(**fields)
         db.add(move_db)
+        record_sync(db, 'move', formatted_name, move_data['name'], fields)
         try:
             db.commit()
             db.refresh(move_db)
+            notify_reference_change('move', move_db.name)
             logger.info(f"Inserted new move: {formatted_name}")
         except IntegrityError:
             db.rollback()
@@ -42,50 +190,35 @@ def insert_move(move_data, db: Session):
     return move_db
 
 def insert_pokemon_data(pokemon_data, db: Session):
-    moves = []
-    for move in pokemon_data['moves']:
-        move_data = fetch_data('move', move['move']['name'])
-        if move_data:
-            moves.append(insert_move(move_data, db))
-
-    stats = Stats(
-        hp=pokemon_data['stats'][0]['base_stat'],
-        atk=pokemon_data['stats'][1]['base_stat'],
-        def_=pokemon_data['stats'][2]['base_stat'],
-        spa=pokemon_data['stats'][3]['base_stat'],
-        spd=pokemon_data['stats'][4]['base_stat'],
-        spe=pokemon_data['stats'][5]['base_stat'],
-        total=sum(stat['base_stat'] for stat in pokemon_data['stats'])
-    )
-    db.add(stats)
-    try:
-        db.commit()
-        db.refresh(stats)
-        logger.info(f"Inserted stats for Pokemon {pokemon_data['name']}")
-    except IntegrityError:
-        db.rollback()
-        logger.error(f"Failed to insert stats for Pokemon {pokemon_data['name']}")
+    plan = plan_pokemon(pokemon_data, db)
+    if plan.pokemon_exists:
+        logger.error(f"Pokemon {plan.pokemon} already exists, skipping ingestion")
         return None
+    logger.info(f"Ingesting Pokemon {plan.pokemon}: {len(plan.known_moves)} moves known, fetching {plan.fetches}")
 
-    pokemon = Pokemon(
-        natdex_id=pokemon_data['id'],
-        name=pokemon_data['name'].replace('-', ' '),
-        pokemon_type="/".join([t['type']['name'] for t in pokemon_data['types']]),
-        abilities="/".join([a['ability']['name'].replace('-', ' ') for a in pokemon_data['abilities']]),
-        base_stats_id=stats.id
-    )
+    move_names = list(plan.known_moves)
+    for move_data in fetch_many('move', plan.missing_moves).values():
+        if move_data:
+            move = insert_move(move_data, db)
+            if move:
+                move_names.append(move.name)
+
+    fields = pokemon_fields(pokemon_data)
+    pokemon = Pokemon(**fields, **stat_columns(pokemon_data))
     db.add(pokemon)
+    record_sync(db, 'pokemon', pokemon.name, pokemon_data['name'], pokemon_sync_fields(pokemon_data))
     try:
         db.commit()
         db.refresh(pokemon)
+        notify_reference_change('pokemon', pokemon.name)
         logger.info(f"Inserted Pokemon: {pokemon.name}")
     except IntegrityError:
         db.rollback()
         logger.error(f"Failed to insert Pokemon {pokemon.name}, it may already exist")
         return None
     
-    for move in moves:
-        link = Links(pokemon_name=pokemon.name, move_name=move.name)
+    for move_name in move_names:
+        link = Links(pokemon_name=pokemon.name, move_name=move_name)
         db.add(link)
     try:
         db.commit()
@@ -97,15 +230,14 @@ def insert_pokemon_data(pokemon_data, db: Session):
     return pokemon
 
 def insert_item(item_data, db: Session):
-    item = Item(
-        id=item_data['id'],
-        name=item_data['name'].replace('-', ' '),
-        description=item_data['effect_entries'][0]['short_effect'] if item_data['effect_entries'] else ''
-    )
+    fields = item_fields(item_data)
+    item = Item(**fields)
     db.add(item)
+    record_sync(db, 'item', item.name, item_data['name'], fields)
     try:
         db.commit()
         db.refresh(item)
+        notify_reference_change('item', item.name)
         logger.info(f"Inserted Item: {item.name}")
         return item
     except IntegrityError:
@@ -114,6 +246,32 @@ def insert_item(item_data, db: Session):
         return None
 
 
+def replay_from_cache(db: Session):
+    """Re-ingest every Pokémon and item held in the upstream cache, e.g. after restoring an empty database.
 
-    
-    
\ No newline at end of file
+    Run with UPSTREAM_OFFLINE=true to guarantee no network traffic."""
+    for name in client.cached_names('pokemon'):
+        if not db.exec(select(Pokemon).where(Pokemon.name == name.replace('-', ' '))).first():
+            pokemon_data = fetch_data('pokemon', name)
+            if pokemon_data:
+                insert_pokemon_data(pokemon_data, db)
+
+    for name in client.cached_names('item'):
+        if not db.exec(select(Item).where(Item.name == name.replace('-', ' '))).first():
+            item_data = fetch_data('item', name)
+            if item_data:
+                insert_item(item_data, db)
+
+
+if __name__ == "__main__":
+    import sys
+    from database import engine
+
+    with Session(engine) as session:
+        if len(sys.argv) > 2 and sys.argv[1] == "plan":
+            # Dry run: python api_insertion.py plan <pokemon> prints the fetches and inserts without writing
+            pokemon_data = fetch_data('pokemon', sys.argv[2])
+            if pokemon_data:
+                print(json.dumps(plan_pokemon(pokemon_data, session).report(), indent=2))
+        else:
+            replay_from_cache(session)
@@ -0,0 +1,49 @@
+"""Compare the old pydantic response path for move lists with the pre-encoded fragment path.
+
+Run with: python bench_serialization.py [rows] [repeats]
+"""
+import json
+import sys
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+
+from json_cache import FragmentCache, encode_move
+from models import Moves, MovesResponse
+
+
+def make_moves(count: int) -> list[Moves]:
+    return [Moves(name=f"move {i}", move_type="electric", category="special", power=90, accuracy=100,
+                  description="Has a 10% chance to paralyze the target.") for i in range(count)]
+
+
+def pydantic_path(moves) -> bytes:
+    # What FastAPI did per request: validate every row, then run the generic encoder and json.dumps
+    validated = [MovesResponse.model_validate(move) for move in moves]
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def fragment_path(cache: FragmentCache, moves) -> bytes:
+    return cache.encode_list('move', moves, key=lambda row: row.name, encode=encode_move)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    moves = make_moves(rows)
+    cache = FragmentCache()
+
+    assert json.loads(pydantic_path(moves)) == json.loads(fragment_path(cache, moves))
+
+    old = timeit.timeit(lambda: pydantic_path(moves), number=repeats) / repeats
+    cold = timeit.timeit(lambda: fragment_path(FragmentCache(), moves), number=repeats) / repeats
+    warm = timeit.timeit(lambda: fragment_path(cache, moves), number=repeats) / repeats
+
+    print(f"{rows} moves per response, {repeats} repeats")
+    print(f"pydantic + jsonable_encoder: {old * 1e6:9.1f} us")
+    print(f"fragments, cold cache:       {cold * 1e6:9.1f} us ({old / cold:.1f}x)")
+    print(f"fragments, warm cache:       {warm * 1e6:9.1f} us ({old / warm:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
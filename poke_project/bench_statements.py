@@ -0,0 +1,83 @@
+"""Compare building a select per request with the prebuilt and prepared lookups in statements.py.
+
+Run with: python bench_statements.py [lookups] [requests_per_second]
+Set BENCH_DATABASE_URL to a migrated Postgres database to include server-side prepared statements;
+by default it runs against a seeded in-memory SQLite database.
+"""
+import sys
+import time
+
+from decouple import config
+from sqlalchemy import create_engine
+from sqlmodel import Session, SQLModel, select
+
+import statements
+from models import Moves
+
+BENCH_DATABASE_URL = config("BENCH_DATABASE_URL", default="sqlite://")
+SEED_MOVES = 1000
+
+
+def per_request(db: Session, name: str):
+    # What get_move_by_name did on a cache miss: a new construct, so a new cache key, every call
+    return db.exec(select(*statements.MOVE_BY_NAME.statement.selected_columns).where(Moves.name == name)).first()
+
+
+def prebuilt_orm(db: Session, name: str):
+    # Same construct every call, still through the ORM session
+    return db.exec(statements.MOVE_BY_NAME.statement, params={"name": name}).first()
+
+
+def prebuilt(db: Session, name: str):
+    return db.connection().execute(statements.MOVE_BY_NAME.statement, {"name": name}).first()
+
+
+def prepared(db: Session, name: str):
+    return statements.MOVE_BY_NAME.first(db, name)
+
+
+def measure(engine, lookup, names: list[str], count: int) -> tuple[float, float]:
+    """Wall and client CPU seconds per lookup, after one warm-up pass."""
+    with Session(engine) as db:
+        for name in names:
+            lookup(db, name)
+        wall, cpu = time.perf_counter(), time.process_time()
+        for i in range(count):
+            lookup(db, names[i % len(names)])
+        return (time.perf_counter() - wall) / count, (time.process_time() - cpu) / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rate = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    engine = create_engine(BENCH_DATABASE_URL)
+    statements.install(engine)
+    if engine.dialect.name == "sqlite":
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as db:
+            db.add_all([Moves(name=f"move {i}", move_type="electric", category="special", power=90, accuracy=100,
+                              description="Has a 10% chance to paralyze the target.") for i in range(SEED_MOVES)])
+            db.commit()
+    with Session(engine) as db:
+        names = db.exec(select(Moves.name).limit(100)).all()
+    if not names:
+        print("No moves to look up, ingest some first")
+        return
+
+    paths = {"select built per request": per_request, "prebuilt, ORM session": prebuilt_orm, "prebuilt, Core (Lookup)": prebuilt}
+    with engine.connect() as connection:
+        if statements.MOVE_BY_NAME.name in connection.info.get("prepared", ()):
+            paths["prebuilt + server PREPARE"] = prepared
+
+    print(f"{count} move lookups on {engine.dialect.name}, CPU at {rate} lookups/s")
+    baseline = None
+    for label, lookup in paths.items():
+        wall, cpu = measure(engine, lookup, names, count)
+        baseline = baseline or cpu
+        print(f"{label:26} {wall * 1e6:8.1f} us wall {cpu * 1e6:8.1f} us CPU ({baseline / cpu:.1f}x)  "
+              f"{cpu * rate:.1%} of a core")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import numpy as np
+
+# ----- TYPE CHART -----
+
+TYPES = ["normal", "fire", "water", "electric", "grass", "ice", "fighting", "poison", "ground",
+         "flying", "psychic", "bug", "rock", "ghost", "dragon", "dark", "steel", "fairy"]
+TYPE_INDEX = {name: i for i, name in enumerate(TYPES)}
+NO_TYPE = len(TYPES)  # Neutral against everything, used for mono-types and unknown types
+
+# Only the non-neutral matchups: attacking type -> {defending type: multiplier}
+_MATCHUPS = {
+    "normal": {"rock": 0.5, "ghost": 0, "steel": 0.5},
+    "fire": {"fire": 0.5, "water": 0.5, "grass": 2, "ice": 2, "bug": 2, "rock": 0.5, "dragon": 0.5, "steel": 2},
+    "water": {"fire": 2, "water": 0.5, "grass": 0.5, "ground": 2, "rock": 2, "dragon": 0.5},
+    "electric": {"water": 2, "electric": 0.5, "grass": 0.5, "ground": 0, "flying": 2, "dragon": 0.5},
+    "grass": {"fire": 0.5, "water": 2, "grass": 0.5, "poison": 0.5, "ground": 2, "flying": 0.5, "bug": 0.5,
+              "rock": 2, "dragon": 0.5, "steel": 0.5},
+    "ice": {"fire": 0.5, "water": 0.5, "grass": 2, "ice": 0.5, "ground": 2, "flying": 2, "dragon": 2, "steel": 0.5},
+    "fighting": {"normal": 2, "ice": 2, "poison": 0.5, "flying": 0.5, "psychic": 0.5, "bug": 0.5, "rock": 2,
+                 "ghost": 0, "dark": 2, "steel": 2, "fairy": 0.5},
+    "poison": {"grass": 2, "poison": 0.5, "ground": 0.5, "rock": 0.5, "ghost": 0.5, "steel": 0, "fairy": 2},
+    "ground": {"fire": 2, "electric": 2, "grass": 0.5, "poison": 2, "flying": 0, "bug": 0.5, "rock": 2, "steel": 2},
+    "flying": {"electric": 0.5, "grass": 2, "fighting": 2, "bug": 2, "rock": 0.5, "steel": 0.5},
+    "psychic": {"fighting": 2, "poison": 2, "psychic": 0.5, "dark": 0, "steel": 0.5},
+    "bug": {"fire": 0.5, "grass": 2, "fighting": 0.5, "poison": 0.5, "flying": 0.5, "psychic": 2, "ghost": 0.5,
+            "dark": 2, "steel": 0.5, "fairy": 0.5},
+    "rock": {"fire": 2, "ice": 2, "fighting": 0.5, "ground": 0.5, "flying": 2, "bug": 2, "steel": 0.5},
+    "ghost": {"normal": 0, "psychic": 2, "ghost": 2, "dark": 0.5},
+    "dragon": {"dragon": 2, "steel": 0.5, "fairy": 0},
+    "dark": {"fighting": 0.5, "psychic": 2, "ghost": 2, "dark": 0.5, "fairy": 0.5},
+    "steel": {"fire": 0.5, "water": 0.5, "electric": 0.5, "ice": 2, "rock": 2, "steel": 0.5, "fairy": 2},
+    "fairy": {"fire": 0.5, "fighting": 2, "poison": 0.5, "dragon": 2, "dark": 2, "steel": 0.5},
+}
+
+EFFECTIVENESS = np.ones((len(TYPES) + 1, len(TYPES) + 1))
+for attacking, matchups in _MATCHUPS.items():
+    for defending, multiplier in matchups.items():
+        EFFECTIVENESS[TYPE_INDEX[attacking], TYPE_INDEX[defending]] = multiplier
+
+IV = 31
+STAB = 1.5
+MIN_ROLL = 0.85
+
+
+def type_index(type_name: str | None) -> int:
+    return TYPE_INDEX.get((type_name or "").lower(), NO_TYPE)
+
+
+def pokemon_type_indices(pokemon_type: str) -> tuple[int, int]:
+    """Split a stored "fire/flying" type string into two chart indices (NO_TYPE for mono-types)."""
+    types = [type_index(t) for t in pokemon_type.split('/')] + [NO_TYPE]
+    return types[0], types[1]
+
+
+def battle_stat(base, level, is_hp=False):
+    """Stat at a given level with max IVs, no EVs and a neutral nature. Works on scalars or arrays."""
+    scaled = np.floor((2 * np.asarray(base) + IV) * level / 100)
+    return scaled + level + 10 if is_hp else scaled + 5
+
+
+# ----- DAMAGE -----
+
+def damage_range(level, power, attack, defense, move_type, attacker_types, defender_types, defender_hp):
+    """Vectorized damage roll range.
+
+    Every argument may be a scalar or a NumPy array; shapes broadcast, so passing attacker
+    columns shaped (M, 1) and defender columns shaped (1, D) yields (M, D) matrices.
+    attacker_types/defender_types are (type1, type2) pairs of chart indices.
+    Returns min damage, max damage (whole HP, as ints), min % of defender HP, max % and the type multiplier."""
+    power = np.nan_to_num(np.asarray(power, dtype=float))
+    base = np.floor(np.floor(np.floor(2 * level / 5 + 2) * power * attack / defense) / 50) + 2
+    base = np.where(power > 0, base, 0)
+
+    # A mono-type attacker's second type is NO_TYPE, which must not match a move of unknown type
+    same_type = ((move_type == attacker_types[0]) | (move_type == attacker_types[1])) & (move_type != NO_TYPE)
+    stab = np.where(same_type, STAB, 1.0)
+    effectiveness = EFFECTIVENESS[move_type, defender_types[0]] * EFFECTIVENESS[move_type, defender_types[1]]
+
+    max_damage = np.floor(np.floor(base * stab) * effectiveness)
+    min_damage = np.floor(np.floor(np.floor(base * MIN_ROLL) * stab) * effectiveness)
+    # The rolls are floored floats; ints keep responses from showing HP as 66.0
+    return (min_damage.astype(int), max_damage.astype(int),
+            np.round(100 * min_damage / defender_hp, 1), np.round(100 * max_damage / defender_hp, 1),
+            effectiveness)
+
+
+def move_columns(moves):
+    """Power, physical flag and type index arrays for a list of Moves rows."""
+    power = np.array([move.power if move.power and move.category != "status" else 0 for move in moves], dtype=float)
+    physical = np.array([move.category != "special" for move in moves])
+    move_type = np.array([type_index(move.move_type) for move in moves])
+    return power, physical, move_type
+
+
+def pokemon_columns(pokemon_list, level):
+    """Battle stats and type index arrays for a list of Pokemon rows with stats."""
+    stats = np.array([[p.hp, p.atk, p.def_, p.spa, p.spd]
+                      for p in pokemon_list], dtype=float).reshape(-1, 5)
+    types = np.array([pokemon_type_indices(p.pokemon_type) for p in pokemon_list]).reshape(-1, 2)
+    return {
+        "hp": battle_stat(stats[:, 0], level, is_hp=True),
+        "atk": battle_stat(stats[:, 1], level),
+        "def": battle_stat(stats[:, 2], level),
+        "spa": battle_stat(stats[:, 3], level),
+        "spd": battle_stat(stats[:, 4], level),
+        "type1": types[:, 0],
+        "type2": types[:, 1],
+    }
+
+
+def matchup_matrix(attacks, defenders, level=50):
+    """Damage for every (attacker, move) row against every defender, without Python loops over the pairs.
+
+    attacks is a list of (attacker Pokemon, Moves) pairs and defenders a list of Pokemon; returns a
+    dict of (len(attacks), len(defenders)) arrays."""
+    attacker_cols = pokemon_columns([attacker for attacker, _ in attacks], level)
+    defender_cols = pokemon_columns(defenders, level)
+    power, physical, move_type = move_columns([move for _, move in attacks])
+
+    # Attack rows are shaped (M, 1) and defender columns (1, D) so everything broadcasts to (M, D)
+    attack = np.where(physical, attacker_cols["atk"], attacker_cols["spa"])[:, None]
+    defense = np.where(physical[:, None], defender_cols["def"][None, :], defender_cols["spd"][None, :])
+
+    min_damage, max_damage, min_percent, max_percent, effectiveness = damage_range(
+        level,
+        power[:, None],
+        attack,
+        defense,
+        move_type[:, None],
+        (attacker_cols["type1"][:, None], attacker_cols["type2"][:, None]),
+        (defender_cols["type1"][None, :], defender_cols["type2"][None, :]),
+        defender_cols["hp"][None, :]
+    )
+    return {
+        "min_damage": min_damage,
+        "max_damage": max_damage,
+        "min_percent": min_percent,
+        "max_percent": max_percent,
+        "effectiveness": effectiveness,
+    }
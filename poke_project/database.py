@@ -1,9 +1,102 @@
-from decouple import config
+import itertools
+import logging
+import threading
+import time
+from typing import Optional
+
+from decouple import config, Csv
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
 from sqlmodel import Session, create_engine
 
-DATABASE_URL = config("DATABASE_URL")
-engine = create_engine(DATABASE_URL)
+import statements
+
+SNAPSHOT_PATH = config("SNAPSHOT_PATH", default="")  # Serve reference data from a read-only snapshot file
+SNAPSHOT_MODE = bool(SNAPSHOT_PATH)
+DATABASE_URL = config("DATABASE_URL", default="") if SNAPSHOT_MODE else config("DATABASE_URL")
+DATABASE_REPLICA_URLS = config("DATABASE_REPLICA_URLS", default="", cast=Csv())
+REPLICA_HEALTH_INTERVAL = config("REPLICA_HEALTH_INTERVAL", default=10.0, cast=float)
+
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+logger = logging.getLogger(__name__)
+
+if SNAPSHOT_MODE:
+    from snapshot import snapshot_engine
+    engine = snapshot_engine(SNAPSHOT_PATH)
+else:
+    engine = create_engine(DATABASE_URL)
+    statements.install(engine)
+
+
+# ----- READ REPLICAS -----
+
+class ReplicaPool:
+    """Round-robin over read replicas, skipping any that failed a health check recently."""
+
+    def __init__(self, engines: list[Engine], health_interval: float = REPLICA_HEALTH_INTERVAL):
+        self.engines = engines
+        self.health_interval = health_interval
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._checked_at: dict[Engine, float] = {}
+        self._healthy: dict[Engine, bool] = {}
+
+    def _is_healthy(self, replica: Engine) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at.get(replica, float("-inf")) < self.health_interval:
+                return self._healthy[replica]
+            self._checked_at[replica] = now
+
+        try:
+            with replica.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            healthy = True
+        except Exception as e:
+            logger.warning(f"Read replica {replica.url.render_as_string(hide_password=True)} failed health check: {e}")
+            healthy = False
+
+        with self._lock:
+            self._healthy[replica] = healthy
+        return healthy
+
+    def next_engine(self) -> Optional[Engine]:
+        for _ in range(len(self.engines)):
+            replica = self.engines[next(self._counter) % len(self.engines)]
+            if self._is_healthy(replica):
+                return replica
+        return None
+
+
+replicas = ReplicaPool([] if SNAPSHOT_MODE else [create_engine(url, pool_pre_ping=True) for url in DATABASE_REPLICA_URLS])
+for replica in replicas.engines:
+    statements.install(replica)
+
+
+class RoutingSession(Session):
+    """Session that reads from a replica until it writes anything, then sticks to the primary.
+
+    Sticking to the primary after the first write keeps read-your-writes within a request,
+    e.g. a lazy ingestion insert followed by reading the inserted row back."""
+
+    def __init__(self, primary: Engine = engine, read_engine: Optional[Engine] = None, **kwargs):
+        super().__init__(primary, **kwargs)
+        self.primary = primary
+        self.read_engine = read_engine
+        self.wrote = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.read_engine is None or self.wrote:
+            return self.primary
+        if self._flushing or (clause is not None and getattr(clause, "is_dml", False)):
+            self.wrote = True
+            return self.primary
+        return self.read_engine
+
 
-def get_db():
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+def get_db(request: Request):
+    read_engine = replicas.next_engine() if request.method in READ_METHODS else None
+    with RoutingSession(engine, read_engine) as session:
+        yield session
@@ -0,0 +1,115 @@
+import csv
+import io
+import json
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import tuple_
+from sqlmodel import Session, select
+
+from models import Links, Moves, Pokemon
+
+CHUNK_ROWS = 500  # Rows encoded per chunk written to the response
+YIELD_PER = 1000  # Rows fetched per round trip from the server-side cursor
+
+# ----- EXPORTABLE TABLES -----
+
+POKEMON_COLUMNS = [Pokemon.natdex_id, Pokemon.name, Pokemon.pokemon_type, Pokemon.abilities,
+                   Pokemon.hp, Pokemon.atk, Pokemon.def_, Pokemon.spa, Pokemon.spd, Pokemon.spe, Pokemon.total]
+
+TABLES = {
+    "moves": {
+        "columns": [Moves.name, Moves.move_type, Moves.category, Moves.power, Moves.accuracy, Moves.description],
+        "key": [Moves.name],
+    },
+    "pokemon": {
+        "columns": POKEMON_COLUMNS,
+        "key": [Pokemon.natdex_id],
+    },
+    "links": {
+        "columns": [Links.pokemon_name, Links.move_name],
+        "key": [Links.pokemon_name, Links.move_name],
+    },
+}
+
+KEY_SEPARATOR = "|"
+
+
+def fieldnames(table: str) -> list[str]:
+    return [column.key for column in TABLES[table]["columns"]]
+
+
+def parse_after(table: str, after: str) -> tuple:
+    """Turn a resume token back into key values. Composite keys are joined with KEY_SEPARATOR."""
+    key = TABLES[table]["key"]
+    values = after.split(KEY_SEPARATOR) if len(key) > 1 else [after]
+    if len(values) != len(key):
+        raise ValueError(f"Resume token for {table} needs {len(key)} parts separated by '{KEY_SEPARATOR}'")
+    return tuple(int(value) if column.key == "natdex_id" else value for column, value in zip(key, values))
+
+
+def resume_token(table: str, row: dict) -> str:
+    """The ?after= value that resumes an export just past row."""
+    return KEY_SEPARATOR.join(str(row[column.key]) for column in TABLES[table]["key"])
+
+
+def iter_rows(db: Session, table: str, after: Optional[str] = None, limit: Optional[int] = None) -> Iterator[dict]:
+    """Stream rows in key order through a server-side cursor so memory stays flat however large the table is."""
+    spec = TABLES[table]
+    query = select(*spec["columns"])
+
+    if after is not None:
+        after_values = parse_after(table, after)
+        if len(spec["key"]) > 1:
+            query = query.where(tuple_(*spec["key"]) > tuple_(*after_values))
+        else:
+            query = query.where(spec["key"][0] > after_values[0])
+
+    query = query.order_by(*spec["key"])
+    if limit is not None:
+        query = query.limit(limit)
+
+    names = fieldnames(table)
+    result = db.exec(query.execution_options(stream_results=True, yield_per=YIELD_PER))
+    for row in result:
+        yield dict(zip(names, row))
+
+
+# ----- ENCODERS -----
+
+def _chunked(rows: Iterable[dict]) -> Iterator[list[dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_ROWS:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def encode_ndjson(rows: Iterable[dict]) -> Iterator[bytes]:
+    for chunk in _chunked(rows):
+        yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in chunk).encode()
+
+
+def encode_csv(rows: Iterable[dict], names: list[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=names)
+    writer.writeheader()
+    for chunk in _chunked(rows):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header and trailer
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,70 @@
+from collections import defaultdict
+
+from sqlmodel import Session, select
+
+from json_cache import MOVE_FIELDS
+from models import Links, Moves, Pokemon
+
+POKEMON_FIELDS = ("natdex_id", "name", "pokemon_type", "abilities")
+STATS_FIELDS = ("hp", "atk", "def_", "spa", "spd", "spe", "total")
+INCLUDES = ("stats", "moves")
+
+# Embedded objects can be narrowed too, e.g. fields=name,stats.spe,moves.name
+ALLOWED_FIELDS = POKEMON_FIELDS + tuple(f"stats.{field}" for field in STATS_FIELDS) + tuple(f"moves.{field}" for field in MOVE_FIELDS)
+
+
+class FieldsetError(ValueError):
+    pass
+
+
+def parse_list(value: str | None, allowed: tuple, label: str) -> list[str]:
+    if not value:
+        return []
+    parts = list(dict.fromkeys(part.strip() for part in value.split(",") if part.strip()))
+    unknown = [part for part in parts if part not in allowed]
+    if unknown:
+        raise FieldsetError(f"Unknown {label}: {', '.join(unknown)}. Choose from: {', '.join(allowed)}")
+    return parts
+
+
+class Fieldset:
+    """Parsed ?fields= and ?include= for Pokémon responses."""
+
+    def __init__(self, fields: str | None = None, include: str | None = None):
+        requested = parse_list(fields, ALLOWED_FIELDS, "fields")
+        self.include = set(parse_list(include, INCLUDES, "include"))
+        self.pokemon = [field for field in requested if "." not in field] or list(POKEMON_FIELDS)
+        self.stats = [field.split(".", 1)[1] for field in requested if field.startswith("stats.")] or list(STATS_FIELDS)
+        self.moves = [field.split(".", 1)[1] for field in requested if field.startswith("moves.")] or list(MOVE_FIELDS)
+        # Asking for an embedded field implies embedding it
+        self.include |= {field.split(".", 1)[0] for field in requested if "." in field}
+        self.sparse = bool(fields or include)
+
+    def load(self, db: Session, names: list[str]) -> dict[str, dict]:
+        """Build {name: response dict} selecting only the requested columns.
+
+        Pokémon and stats come from one query on the pokemon table, moves from one more query for all names."""
+        columns = [getattr(Pokemon, field) for field in dict.fromkeys(["name", *self.pokemon])]
+        query = select(*columns).where(Pokemon.name.in_(names))
+        if "stats" in self.include:
+            query = query.add_columns(Pokemon.hp.label("stats__present"), *[getattr(Pokemon, field).label(f"stats__{field}") for field in self.stats])
+
+        results = {}
+        for row in db.execute(query).mappings().all():
+            result = {field: row[field] for field in self.pokemon}
+            if "stats" in self.include:
+                result["stats"] = {field: row[f"stats__{field}"] for field in self.stats} if row["stats__present"] is not None else None
+            results[row["name"]] = result
+
+        if "moves" in self.include and results:
+            moves = defaultdict(list)
+            query = (select(Links.pokemon_name, *[getattr(Moves, field) for field in self.moves])
+                     .join(Moves, Moves.name == Links.move_name)
+                     .where(Links.pokemon_name.in_(list(results)))
+                     .order_by(Moves.name))
+            for row in db.execute(query).mappings().all():
+                moves[row["pokemon_name"]].append({field: row[field] for field in self.moves})
+            for name, result in results.items():
+                result["moves"] = moves[name]
+
+        return results
@@ -0,0 +1,244 @@
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+from typing import Callable, Optional
+
+from decouple import config
+from sqlalchemy import or_, update
+from sqlmodel import Session, select
+
+from database import engine
+from api_insertion import fetch_data, insert_pokemon_data, insert_move, insert_item, utcnow
+from models import IngestionJob, Pokemon, Moves, Item
+from upstream import UpstreamOverloaded
+
+ASYNC_INGESTION = config("ASYNC_INGESTION", default=False, cast=bool)  # Queue every cold lookup instead of ingesting inline
+JOB_WORKERS = config("JOB_WORKERS", default=4, cast=int)
+JOB_MAX_ATTEMPTS = config("JOB_MAX_ATTEMPTS", default=3, cast=int)
+JOB_LEASE_SECONDS = config("JOB_LEASE_SECONDS", default=60, cast=int)  # A running job whose owner hasn't heartbeated for this long is requeued
+
+logger = logging.getLogger(__name__)
+
+KINDS = {
+    # kind: (upstream endpoint, model, insert function, resource path)
+    "pokemon": ("pokemon", Pokemon, insert_pokemon_data, "/pokemon/{name}"),
+    "move": ("move", Moves, insert_move, "/move/{name}"),
+    "item": ("item", Item, insert_item, "/item/{name}"),
+}
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def resource_url(job: IngestionJob) -> Optional[str]:
+    return KINDS[job.kind][3].format(name=job.name) if job.status == "done" else None
+
+
+class JobQueue:
+    """In-process worker pool for ingestion jobs, backed by the ingestion_jobs table.
+
+    The table is the source of truth and every uvicorn worker runs its own JobQueue, so a job is
+    claimed with a conditional UPDATE and only the process that flipped it to running executes it.
+    Running jobs hold a lease renewed by their owner's heartbeat; when an owner dies its lease
+    expires and any live process requeues the job. Workers start on first use."""
+
+    def __init__(self, session_factory: Callable[[], Session], workers: int = JOB_WORKERS,
+                 lease_seconds: int = JOB_LEASE_SECONDS):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._running: set[int] = set()
+        self._queue: queue.Queue[int] = queue.Queue()
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+        self._started = False
+        self.metrics = {
+            "enqueued_total": 0,
+            "completed_total": 0,
+            "failed_total": 0,
+            "retried_total": 0,
+            "queue_seconds_total": 0.0,
+            "run_seconds_total": 0.0,
+        }
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f"ingestion-worker-{i}", daemon=True).start()
+        threading.Thread(target=self._maintain_leases, name="ingestion-leases", daemon=True).start()
+
+    def enqueue(self, db: Session, kind: str, name: str) -> IngestionJob:
+        """Queue an ingestion, reusing an active job for the same resource instead of duplicating it."""
+        existing = db.exec(select(IngestionJob).where(
+            IngestionJob.kind == kind, IngestionJob.name == name, IngestionJob.status.in_(ACTIVE_STATUSES)
+        )).first()
+        if existing:
+            return existing
+
+        job = IngestionJob(kind=kind, name=name, status="queued", created_at=utcnow())
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+
+        self._ensure_started()
+        self._queue.put(job.id)
+        with self._lock:
+            self.metrics["enqueued_total"] += 1
+        return job
+
+    def requeue_expired(self, db: Session) -> int:
+        """Put running jobs whose lease has expired back in the queue. Live owners keep theirs."""
+        cutoff = utcnow() - timedelta(seconds=self.lease_seconds)
+        expired = (IngestionJob.status == "running",
+                   or_(IngestionJob.heartbeat_at.is_(None), IngestionJob.heartbeat_at < cutoff))
+        # Jobs that keep taking their owner down are given up on instead of retried forever
+        db.exec(update(IngestionJob)
+                .where(*expired, IngestionJob.attempts >= JOB_MAX_ATTEMPTS)
+                .values(status="failed", error="Worker died while running the job", owner=None, heartbeat_at=None,
+                        finished_at=utcnow()))
+        result = db.exec(update(IngestionJob).where(*expired).values(status="queued", owner=None, heartbeat_at=None))
+        db.commit()
+        return result.rowcount
+
+    def resume(self) -> int:
+        """Requeue jobs orphaned by dead processes and pick up every queued job.
+
+        Several processes may queue the same id locally; the claim in _run lets only one of them run it."""
+        with self.session_factory() as db:
+            expired = self.requeue_expired(db)
+            job_ids = db.exec(select(IngestionJob.id).where(IngestionJob.status == "queued").order_by(IngestionJob.id)).all()
+
+        self._ensure_started()
+        for job_id in job_ids:
+            self._queue.put(job_id)
+        if job_ids:
+            logger.info(f"Resumed {len(job_ids)} ingestion jobs, {expired} of them from expired leases")
+        return len(job_ids)
+
+    def _maintain_leases(self):
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            try:
+                with self.session_factory() as db:
+                    with self._lock:
+                        running = list(self._running)
+                    if running:
+                        db.exec(update(IngestionJob)
+                                .where(IngestionJob.id.in_(running), IngestionJob.owner == self.owner)
+                                .values(heartbeat_at=utcnow()))
+                        db.commit()
+                    if self.requeue_expired(db):
+                        for job_id in db.exec(select(IngestionJob.id).where(IngestionJob.status == "queued")).all():
+                            self._queue.put(job_id)
+            except Exception:
+                logger.exception("Failed to renew ingestion job leases")
+
+    def claim(self, db: Session, job_id: int) -> bool:
+        """Atomically move a queued job to running under this process. False if another process got it first."""
+        now = utcnow()
+        result = db.exec(update(IngestionJob)
+                         .where(IngestionJob.id == job_id, IngestionJob.status == "queued")
+                         .values(status="running", owner=self.owner, heartbeat_at=now, started_at=now,
+                                 attempts=IngestionJob.attempts + 1))
+        db.commit()
+        return result.rowcount == 1
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run(job_id)
+            except Exception:
+                logger.exception(f"Ingestion job {job_id} crashed")
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job_id: int):
+        with self._lock:
+            self._running.add(job_id)
+        try:
+            self._execute(job_id)
+        finally:
+            # A crashed job stops heartbeating here, so its lease expires and it is retried or failed
+            with self._lock:
+                self._running.discard(job_id)
+
+    def _execute(self, job_id: int):
+        with self.session_factory() as db:
+            if not self.claim(db, job_id):
+                return
+            job = db.get(IngestionJob, job_id)
+            queued_for = (job.started_at - job.created_at).total_seconds()
+
+            endpoint, model, insert, _ = KINDS[job.kind]
+            run_started = time.monotonic()
+            retry_after = None
+            try:
+                if db.exec(select(model).where(model.name == job.name)).first():
+                    job.status = "done"
+                else:
+                    data = fetch_data(endpoint, job.name)
+                    if data is None:
+                        job.status, job.error = "failed", f"{job.kind} {job.name} not found upstream"
+                    elif insert(data, db) is None:
+                        job.status, job.error = "failed", f"Failed to insert {job.kind} {job.name}"
+                    else:
+                        job.status = "done"
+            except UpstreamOverloaded as e:
+                if job.attempts < JOB_MAX_ATTEMPTS:
+                    job.status = "queued"
+                    retry_after = e.retry_after
+                else:
+                    job.status, job.error = "failed", str(e)
+
+            if job.status != "queued":
+                job.finished_at = utcnow()
+            job.owner = job.heartbeat_at = None
+            db.add(job)
+            db.commit()
+            status = job.status
+
+        with self._finished:
+            self.metrics["queue_seconds_total"] += queued_for
+            self.metrics["run_seconds_total"] += time.monotonic() - run_started
+            if status == "done":
+                self.metrics["completed_total"] += 1
+            elif status == "failed":
+                self.metrics["failed_total"] += 1
+            else:
+                self.metrics["retried_total"] += 1
+            self._finished.notify_all()
+
+        if retry_after is not None:
+            threading.Timer(retry_after, self._queue.put, args=(job_id,)).start()
+
+    def wait(self, job_id: int, timeout: float) -> Optional[IngestionJob]:
+        """Long-poll: block until the job finishes or timeout passes, then return its current row."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.session_factory() as db:
+                job = db.get(IngestionJob, job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job.status not in ACTIVE_STATUSES or remaining <= 0:
+                return job
+            with self._finished:
+                # Jobs finished by another process don't notify us, so re-check at least every second
+                self._finished.wait(min(remaining, 1.0))
+
+    def metrics_snapshot(self) -> dict:
+        with self._lock:
+            return {**self.metrics, "queue_depth": self.depth()}
+
+
+job_queue = JobQueue(lambda: Session(engine))
@@ -0,0 +1,84 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from decouple import config
+
+from shared_cache import CACHE_TTL
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib encoder produces the same output just slower
+    orjson = None
+
+MAX_FRAGMENTS = config("JSON_CACHE_MAX_FRAGMENTS", default=50000, cast=int)
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FragmentCache:
+    """LRU cache of pre-encoded JSON bytes per entity.
+
+    List responses are assembled by joining cached fragments, so each row is encoded once
+    instead of being re-validated by pydantic and re-encoded on every request. Entries are
+    dropped when ingestion reports a write to the entity, and expire after ttl in case the
+    write happened in another worker."""
+
+    def __init__(self, max_entries: int = MAX_FRAGMENTS, ttl: int = CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._fragments: OrderedDict[tuple, tuple[float, bytes]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def fragment(self, kind: str, key, row, encode) -> bytes:
+        cache_key = (kind, key)
+        with self._lock:
+            cached = self._fragments.get(cache_key)
+            if cached is not None and time.monotonic() - cached[0] <= self.ttl:
+                self._fragments.move_to_end(cache_key)
+                self.hits += 1
+                return cached[1]
+
+        encoded = dumps(encode(row))
+        with self._lock:
+            self.misses += 1
+            self._fragments[cache_key] = (time.monotonic(), encoded)
+            self._fragments.move_to_end(cache_key)
+            if len(self._fragments) > self.max_entries:
+                self._fragments.popitem(last=False)
+        return encoded
+
+    def encode_list(self, kind: str, rows, key, encode) -> bytes:
+        return b"[" + b",".join(self.fragment(kind, key(row), row, encode) for row in rows) + b"]"
+
+    def invalidate(self, kind: str, key=None):
+        with self._lock:
+            if key is not None:
+                self._fragments.pop((kind, key), None)
+            else:
+                for cache_key in [cache_key for cache_key in self._fragments if cache_key[0] == kind]:
+                    del self._fragments[cache_key]
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+
+
+fragment_cache = FragmentCache()
+
+
+# ----- ENCODERS -----
+
+# Same fields, in the same order, as MovesResponse
+MOVE_FIELDS = ("name", "move_type", "category", "power", "accuracy", "description")
+
+
+def encode_move(row) -> dict:
+    return {field: getattr(row, field) for field in MOVE_FIELDS}
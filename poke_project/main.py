@@ -1,15 +1,68 @@
-from fastapi import Depends, FastAPI, HTTPException, Query, Body
+import numpy as np
+from fastapi import Depends, FastAPI, HTTPException, Query, Body, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from sqlmodel import Session, select, delete
-from sqlalchemy.orm import joinedload
-
-from database import get_db
-from models import Links, Pokemon, Moves, Item, PokemonResponse, StatsResponse, MovesResponse, Team, TeamMember, TeamMemberMove, TeamMemberResponse, TeamResponse
-
-from api_insertion import fetch_data, insert_pokemon_data, insert_item, insert_move
+from sqlalchemy.orm import joinedload, selectinload
+
+from database import get_db, engine, SNAPSHOT_MODE
+from models import Links, Pokemon, Moves, Item, PokemonResponse, StatsResponse, MovesResponse, Team, TeamMember, TeamMemberMove, TeamMemberResponse, TeamResponse, PokemonBatchResponse, MovesBatchResponse, ItemsBatchResponse, TeamValidationRequest, TeamValidationResult, IngestionJob, IngestionJobResponse, IngestionPlanResponse
+
+from api_insertion import fetch_data, fetch_many, insert_pokemon_data, insert_item, insert_move, plan_pokemon
+from name_index import name_index, KINDS
+import export
+import team_writer
+import team_listing
+from team_index import team_index
+from team_validator import validator
+import damage
+import recommender
+import text_search
+import refresh
+from upstream import client as upstream_client, UpstreamOverloaded
+import jobs
+from jobs import job_queue
+from json_cache import fragment_cache, encode_move, dumps, MOVE_FIELDS
+from fieldsets import Fieldset, FieldsetError
+from statements import ITEM_BY_NAME, MOVE_BY_NAME, POKEMON_BY_NAME, STATS_BY_NAME
+from shared_cache import cache as response_cache, bus
 
 app = FastAPI()
 
+MOVE_COLUMNS = [getattr(Moves, field) for field in MOVE_FIELDS]
+
+@app.on_event("startup")
+def start_refresh_worker():
+    # Snapshot deployments can't write, so they never refresh
+    if not SNAPSHOT_MODE:
+        app.state.refresh_stop = refresh.start_worker(engine)
+
+@app.on_event("startup")
+def resume_ingestion_jobs():
+    if not SNAPSHOT_MODE:
+        job_queue.resume()
+
+@app.on_event("startup")
+def start_invalidation_listener():
+    # Picks up writes made by the other workers so their cached responses are dropped here too
+    app.state.invalidation_stop = bus.start(engine)
+
+@app.on_event("shutdown")
+def stop_refresh_worker():
+    if getattr(app.state, "refresh_stop", None):
+        app.state.refresh_stop.set()
+    if getattr(app.state, "invalidation_stop", None):
+        app.state.invalidation_stop.set()
+
+@app.exception_handler(UpstreamOverloaded)
+async def upstream_overloaded_handler(request: Request, exc: UpstreamOverloaded):
+    # Shed load instead of queueing behind PokeAPI; clients retry once capacity frees up
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Upstream capacity exhausted, try again shortly"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -19,19 +72,216 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+MAX_BATCH_NAMES = 50
+
+FIELDS_QUERY = Query(default=None, description="Comma separated columns to return, e.g. name,pokemon_type,stats.spe,moves.name")
+INCLUDE_QUERY = Query(default=None, description="Comma separated related data to embed: stats, moves")
+
+def parse_fieldset(fields: str | None, include: str | None) -> Fieldset:
+    try:
+        return Fieldset(fields, include)
+    except FieldsetError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def json_bytes(content) -> Response:
+    return Response(content=dumps(content), media_type="application/json")
+
+def cached_response(namespace: str, key: str, build) -> Response | None:
+    """Serve from the response cache, building and storing the JSON on a miss. None when build finds nothing."""
+    content = response_cache.get(namespace, key)
+    if content is None:
+        value = build()
+        if value is None:
+            return None
+        content = dumps(value)
+        response_cache.set(namespace, key, content)
+    return Response(content=content, media_type="application/json")
+
+# Cache misses go through the prebuilt (and on Postgres prepared) lookups in statements.py
+def pokemon_json(db: Session, name: str) -> dict | None:
+    pokemon = POKEMON_BY_NAME.first(db, name)
+    return dict(pokemon._mapping) if pokemon else None
+
+def move_json(db: Session, name: str) -> dict | None:
+    move = MOVE_BY_NAME.first(db, name)
+    return encode_move(move) if move else None
+
+def item_json(db: Session, name: str) -> dict | None:
+    item = ITEM_BY_NAME.first(db, name)
+    return dict(item._mapping) if item else None
+
+def wants_async(request: Request) -> bool:
+    """Opt in to 202 Accepted on a miss with ?async=true, a Prefer: respond-async header, or ASYNC_INGESTION."""
+    return (jobs.ASYNC_INGESTION
+            or request.query_params.get("async", "").lower() in ("1", "true")
+            or "respond-async" in request.headers.get("prefer", ""))
+
+def job_response(job: IngestionJob) -> IngestionJobResponse:
+    return IngestionJobResponse(
+        id=job.id,
+        kind=job.kind,
+        name=job.name,
+        status=job.status,
+        error=job.error,
+        status_url=f"/jobs/{job.id}",
+        resource_url=jobs.resource_url(job)
+    )
+
+def accept_ingestion(kind: str, name: str, db: Session) -> JSONResponse:
+    job = job_queue.enqueue(db, kind, name)
+    return JSONResponse(
+        status_code=202,
+        content=job_response(job).model_dump(),
+        headers={"Location": f"/jobs/{job.id}"}
+    )
+
+def check_writable():
+    # Snapshot files are immutable; without this a team write fails inside SQLite and surfaces as a 500
+    if SNAPSHOT_MODE:
+        raise HTTPException(status_code=409, detail="Teams can't be changed in snapshot mode, the data is read-only")
+
+def check_fetch_missing(fetch_missing: bool):
+    # Snapshot deployments are read-only, so asking for ingestion is a conflict rather than a silent no-op
+    if fetch_missing and SNAPSHOT_MODE:
+        raise HTTPException(status_code=409, detail="fetch_missing is not available in snapshot mode, the data is read-only")
+
+def parse_names(names: str) -> list[str]:
+    """Split a comma separated names parameter, dropping blanks and duplicates but keeping order."""
+    parsed = list(dict.fromkeys(name.strip() for name in names.split(',') if name.strip()))
+    if not parsed:
+        raise HTTPException(status_code=400, detail="No names given")
+    if len(parsed) > MAX_BATCH_NAMES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_NAMES} names per request")
+    return parsed
+
 # ---- GET REQUESTS ----
 
+# ----- METRICS -----
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    # Prometheus text format
+    lines = []
+    for name, value in upstream_client.admission.metrics().items():
+        metric_type = "counter" if name.endswith("_total") else "gauge"
+        lines.append(f"# TYPE upstream_{name} {metric_type}")
+        lines.append(f"upstream_{name} {value}")
+    for name, value in job_queue.metrics_snapshot().items():
+        metric_type = "counter" if name.endswith("_total") else "gauge"
+        lines.append(f"# TYPE ingestion_jobs_{name} {metric_type}")
+        lines.append(f"ingestion_jobs_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+# ----- GET MANY POKEMON (WITH STATS) -----
+@app.get("/pokemon", response_model=PokemonBatchResponse)
+async def get_pokemon_batch(names: str = Query(description="Comma separated Pokémon names"),
+                            fetch_missing: bool = Query(default=False, description="Ingest names not yet in the database"),
+                            fields: str = FIELDS_QUERY,
+                            include: str = INCLUDE_QUERY,
+                            db: Session = Depends(get_db)):
+    check_fetch_missing(fetch_missing)
+    names = parse_names(names)
+    fieldset = parse_fieldset(fields, include)
+    if fieldset.sparse:
+        found = fieldset.load(db, names)
+        missing = [name for name in names if name not in found]
+        if fetch_missing and missing:
+            for name, pokemon_data in fetch_many('pokemon', missing).items():
+                inserted_pokemon = insert_pokemon_data(pokemon_data, db) if pokemon_data else None
+                if inserted_pokemon:
+                    found[name] = fieldset.load(db, [inserted_pokemon.name])[inserted_pokemon.name]
+        return json_bytes({
+            "pokemon": [found[name] for name in names if name in found],
+            "not_found": [name for name in names if name not in found]
+        })
+
+    pokemon = db.exec(select(Pokemon).where(Pokemon.name.in_(names))).all()
+    found = {p.name: p for p in pokemon}
+
+    missing = [name for name in names if name not in found]
+    if fetch_missing and missing:
+        for name, pokemon_data in fetch_many('pokemon', missing).items():
+            if pokemon_data:
+                inserted_pokemon = insert_pokemon_data(pokemon_data, db)
+                if inserted_pokemon:
+                    found[name] = inserted_pokemon
+
+    return PokemonBatchResponse(
+        pokemon=[found[name] for name in names if name in found],
+        not_found=[name for name in names if name not in found]
+    )
+
+# ----- GET MANY MOVES -----
+@app.get("/moves/batch", response_model=MovesBatchResponse)
+async def get_moves_batch(names: str = Query(description="Comma separated move names"),
+                          fetch_missing: bool = Query(default=False, description="Ingest names not yet in the database"),
+                          db: Session = Depends(get_db)):
+    check_fetch_missing(fetch_missing)
+    names = parse_names(names)
+    found = {move.name: move for move in db.exec(select(Moves).where(Moves.name.in_(names))).all()}
+
+    missing = [name for name in names if name not in found]
+    if fetch_missing and missing:
+        for name, move_data in fetch_many('move', missing).items():
+            if move_data:
+                inserted_move = insert_move(move_data, db)
+                if inserted_move:
+                    found[name] = inserted_move
+
+    return MovesBatchResponse(
+        moves=[found[name] for name in names if name in found],
+        not_found=[name for name in names if name not in found]
+    )
+
+# ----- GET MANY ITEMS -----
+@app.get("/items/batch", response_model=ItemsBatchResponse)
+async def get_items_batch(names: str = Query(description="Comma separated item names"),
+                          fetch_missing: bool = Query(default=False, description="Ingest names not yet in the database"),
+                          db: Session = Depends(get_db)):
+    check_fetch_missing(fetch_missing)
+    names = parse_names(names)
+    found = {item.name: item for item in db.exec(select(Item).where(Item.name.in_(names))).all()}
+
+    missing = [name for name in names if name not in found]
+    if fetch_missing and missing:
+        for name, item_data in fetch_many('item', missing).items():
+            if item_data:
+                inserted_item = insert_item(item_data, db)
+                if inserted_item:
+                    found[name] = inserted_item
+
+    return ItemsBatchResponse(
+        items=[found[name] for name in names if name in found],
+        not_found=[name for name in names if name not in found]
+    )
+
 # ----- GET POKEMON BY NAME -----
 @app.get("/pokemon/{name}", response_model=PokemonResponse)
-async def get_pokemon_by_name(name: str, db: Session = Depends(get_db)) -> PokemonResponse:
-    pokemon = db.exec(select(Pokemon).where(Pokemon.name == name)).first()
-    if pokemon:
-        return pokemon
+async def get_pokemon_by_name(name: str, request: Request, fields: str = FIELDS_QUERY, include: str = INCLUDE_QUERY,
+                              db: Session = Depends(get_db)) -> PokemonResponse:
+    # ?fields= and ?include= select only the requested columns and embed stats and moves in the same response
+    fieldset = parse_fieldset(fields, include)
+    if fieldset.sparse:
+        found = fieldset.load(db, [name])
+        if name in found:
+            return json_bytes(found[name])
+    else:
+        cached = cached_response('pokemon', name, lambda: pokemon_json(db, name))
+        if cached:
+            return cached
+
+    # Snapshot deployments are read-only, so there is no lazy ingestion
+    if SNAPSHOT_MODE:
+        raise HTTPException(status_code=404, detail="Pokémon not found")
+
+    if wants_async(request):
+        return accept_ingestion('pokemon', name, db)
 
     pokemon_data = fetch_data('pokemon', name)
     if pokemon_data:
         inserted_pokemon = insert_pokemon_data(pokemon_data, db)
         if inserted_pokemon:
+            if fieldset.sparse:
+                return json_bytes(fieldset.load(db, [inserted_pokemon.name])[inserted_pokemon.name])
             return inserted_pokemon
         else:
             raise HTTPException(status_code=500, detail="Failed to insert Pokémon data")
@@ -39,38 +289,46 @@ async def get_pokemon_by_name(name: str, db: Session = Depends(get_db)) -> Pokem
         raise HTTPException(status_code=404, detail="Pokémon not found")
 
 
+# ----- INGESTION PLAN (DRY RUN) -----
+@app.get("/pokemon/{name}/plan", response_model=IngestionPlanResponse)
+def plan_pokemon_ingestion(name: str, db: Session = Depends(get_db)):
+    """Report the upstream fetches and row inserts ingesting this Pokémon would take, without writing anything."""
+    pokemon_data = fetch_data('pokemon', name)
+    if not pokemon_data:
+        raise HTTPException(status_code=404, detail="Pokémon not found")
+    return plan_pokemon(pokemon_data, db).report()
+
+
 # ----- GET POKEMON STATS -----
 @app.get("/pokemon/{name}/stats", response_model=StatsResponse)
 async def get_pokemon_stats(name: str, db: Session = Depends(get_db)) -> StatsResponse:
-    pokemon = db.exec(select(Pokemon).options(joinedload(Pokemon.base_stats)).where(Pokemon.name == name)).first()
-    if not pokemon:
+    # Stats are columns of the Pokémon row, so this is one lookup on the unique name index
+    stats = STATS_BY_NAME.first(db, name)
+    if not stats:
         raise HTTPException(status_code=404, detail="Pokémon not found")
     
-    if not pokemon.base_stats:
+    if stats.hp is None:
         raise HTTPException(status_code=404, detail="Stats not found")
     
-    return pokemon.base_stats
+    return StatsResponse.model_validate(stats._mapping)
 
 # ----- GET POKEMON MOVES -----
 @app.get("/pokemon/{name}/moves", response_model=list[MovesResponse])
 async def get_pokemon_moves(name: str, move: str = Query(default=None), db: Session = Depends(get_db)):
-    pokemon = db.exec(select(Pokemon).options(joinedload(Pokemon.moves)).where(Pokemon.name == name)).first()
-    if not pokemon:
+    pokemon_id = db.exec(select(Pokemon.natdex_id).where(Pokemon.name == name)).first()
+    if pokemon_id is None:
         raise HTTPException(status_code=404, detail="Pokémon not found")
-    
-    if not pokemon.moves:
-        raise HTTPException(status_code=404, detail="Moves not found")
-    
+
+    query = select(*MOVE_COLUMNS).join(Links, Links.move_name == Moves.name).where(Links.pokemon_name == name)
     if move:
-        filter_moves = [link.move for link in pokemon.moves if link.move_name == move]
-        if not filter_moves:
-            raise HTTPException(status_code=404, detail="Move not found for this Pokémon")
-        
-        sorted_moves = sorted(filter_moves, key=lambda move: move.name)
-        return [MovesResponse.model_validate(move) for move in sorted_moves]
-    
-    sorted_moves = sorted([link.move for link in pokemon.moves], key=lambda move: move.name)
-    return [MovesResponse.model_validate(move) for move in sorted_moves]
+        query = query.where(Links.move_name == move)
+    moves = db.exec(query.order_by(Moves.name)).all()
+
+    if not moves:
+        raise HTTPException(status_code=404, detail="Move not found for this Pokémon" if move else "Moves not found")
+
+    return Response(content=fragment_cache.encode_list('move', moves, key=lambda row: row.name, encode=encode_move),
+                    media_type="application/json")
 
 # ----- GET MOVES BY FILTER -----
 @app.get("/moves", response_model=list[MovesResponse])
@@ -84,7 +342,7 @@ async def get_moves(move_type: str = Query(default=None),
                     offset: int = Query(default=0, description="Offset for pagination"), 
                     db: Session = Depends(get_db)):
     
-    query = select(Moves)
+    query = select(*MOVE_COLUMNS)
 
     # Apply filters
     if move_type:
@@ -113,19 +371,24 @@ async def get_moves(move_type: str = Query(default=None),
     # Execute query
     moves = db.exec(query).all()
 
-    # Convert Moves to MovesResponse
-    try:
-        return [MovesResponse.model_validate(move) for move in moves]
-    except ValueError as e:
-        raise HTTPException(status_code=500, detail=f"Error validating move data: {str(e)}")
+    # Join pre-encoded per-move JSON instead of validating and encoding every row
+    return Response(content=fragment_cache.encode_list('move', moves, key=lambda row: row.name, encode=encode_move),
+                    media_type="application/json")
 
 # ----- GET SPECIFIC MOVE ----
 @app.get("/move/{name}", response_model=MovesResponse)
-async def get_move_by_name(name: str, db: Session = Depends(get_db)) -> MovesResponse:
-    move = db.exec(select(Moves).where(Moves.name == name)).first()
-    if move:
-        return move
-    
+async def get_move_by_name(name: str, request: Request, db: Session = Depends(get_db)) -> MovesResponse:
+    cached = cached_response('move', name, lambda: move_json(db, name))
+    if cached:
+        return cached
+
+    # Snapshot deployments are read-only, so there is no lazy ingestion
+    if SNAPSHOT_MODE:
+        raise HTTPException(status_code=404, detail="Move not found")
+
+    if wants_async(request):
+        return accept_ingestion('move', name, db)
+
     move_data = fetch_data('move', name)
     if move_data:
         inserted_move = insert_move(move_data, db)
@@ -138,10 +401,17 @@ async def get_move_by_name(name: str, db: Session = Depends(get_db)) -> MovesRes
 
 # ----- GET ITEM -----
 @app.get("/item/{name}", response_model=Item)
-async def get_item(name: str, db: Session = Depends(get_db)) -> Item:
-    item = db.exec(select(Item).where(Item.name == name)).first()
-    if item:
-        return item
+async def get_item(name: str, request: Request, db: Session = Depends(get_db)) -> Item:
+    cached = cached_response('item', name, lambda: item_json(db, name))
+    if cached:
+        return cached
+
+    # Snapshot deployments are read-only, so there is no lazy ingestion
+    if SNAPSHOT_MODE:
+        raise HTTPException(status_code=404, detail="Item not found")
+
+    if wants_async(request):
+        return accept_ingestion('item', name, db)
 
     item_data = fetch_data('item', name)
     if item_data:
@@ -153,18 +423,234 @@ async def get_item(name: str, db: Session = Depends(get_db)) -> Item:
     else:
        raise HTTPException(status_code=404, detail="Item not found")
    
+# ----- INGESTION JOB STATUS -----
+@app.get("/jobs/{job_id}", response_model=IngestionJobResponse)
+def get_job(job_id: int, wait: float = Query(default=0, ge=0, le=30, description="Long-poll up to this many seconds")):
+    job = job_queue.wait(job_id, wait)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
+
+# ----- SEARCH NAMES (AUTOCOMPLETE) -----
+@app.get("/search/names")
+async def search_names(q: str = Query(min_length=1, description="Partial or misspelled name"),
+                       kind: list[str] = Query(default=None, description="Restrict to pokemon, move and/or item"),
+                       limit: int = Query(default=10, ge=1, le=50),
+                       db: Session = Depends(get_db)):
+    if kind:
+        invalid_kinds = set(kind) - set(KINDS)
+        if invalid_kinds:
+            raise HTTPException(status_code=400, detail=f"Unknown kind: {', '.join(sorted(invalid_kinds))}")
+
+    name_index.ensure_loaded(db)
+    return name_index.search(q, kinds=set(kind) if kind else None, limit=limit)
+
+# ----- FULL TEXT SEARCH -----
+@app.get("/search")
+async def search_descriptions(q: str = Query(min_length=1, description="Words to look for in move and item descriptions"),
+                              kind: list[str] = Query(default=None, description="Restrict to move and/or item"),
+                              move_type: str = Query(default=None),
+                              category: str = Query(default=None),
+                              limit: int = Query(default=20, ge=1, le=100),
+                              db: Session = Depends(get_db)):
+    kinds = set(kind) if kind else {"move", "item"}
+    if kinds - {"move", "item"}:
+        raise HTTPException(status_code=400, detail="kind must be move or item")
+    return text_search.search(db, q, kinds, move_type=move_type, category=category, limit=limit)
+
+# ----- BULK EXPORT -----
+@app.get("/export/{table}")
+async def export_table(table: str,
+                       request: Request,
+                       format: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+                       after: str = Query(default=None, description="Resume after this key (composite keys joined with '|')"),
+                       limit: int = Query(default=None, ge=1, description="Stop after this many rows"),
+                       db: Session = Depends(get_db)):
+    if table not in export.TABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown table, choose from: {', '.join(export.TABLES)}")
+    if after is not None:
+        try:
+            export.parse_after(table, after)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    rows = export.iter_rows(db, table, after=after, limit=limit)
+    if format == "csv":
+        body = export.encode_csv(rows, export.fieldnames(table))
+        media_type = "text/csv"
+    else:
+        body = export.encode_ndjson(rows)
+        media_type = "application/x-ndjson"
+
+    headers = {}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        body = export.gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+# ----- DAMAGE CALCULATOR -----
+def get_pokemon_with_stats(name: str, db: Session) -> Pokemon:
+    pokemon = db.exec(select(Pokemon).where(Pokemon.name == name)).first()
+    if not pokemon:
+        raise HTTPException(status_code=404, detail=f"Pokémon {name} not found")
+    if pokemon.hp is None:
+        raise HTTPException(status_code=404, detail=f"Stats not found for {name}")
+    return pokemon
+
+@app.get("/damage")
+async def calculate_damage(attacker: str, move: str, defender: str,
+                           level: int = Query(default=50, ge=1, le=100),
+                           db: Session = Depends(get_db)):
+    attacking_pokemon = get_pokemon_with_stats(attacker, db)
+    defending_pokemon = get_pokemon_with_stats(defender, db)
+    attack_move = db.exec(select(Moves).where(Moves.name == move)).first()
+    if not attack_move:
+        raise HTTPException(status_code=404, detail=f"{move} not found")
+
+    result = damage.matchup_matrix([(attacking_pokemon, attack_move)], [defending_pokemon], level)
+    return {
+        "attacker": attacker,
+        "move": move,
+        "defender": defender,
+        "level": level,
+        **{key: values[0, 0].item() for key, values in result.items()}
+    }
+
+@app.get("/teams/{attacker_team}/matchup/{defender_team}")
+async def team_matchup(attacker_team: str, defender_team: str,
+                       level: int = Query(default=50, ge=1, le=100),
+                       db: Session = Depends(get_db)):
+    member_options = selectinload(Team.members).options(
+        selectinload(TeamMember.pokemon),
+        selectinload(TeamMember.team_member_moves).joinedload(TeamMemberMove.move)
+    )
+    teams = {team.name: team for team in db.exec(
+        select(Team).options(member_options).where(Team.name.in_([attacker_team, defender_team]))
+    ).all()}
+    for team_name in (attacker_team, defender_team):
+        if team_name not in teams:
+            raise HTTPException(status_code=404, detail=f"Team {team_name} not found")
+        for member in teams[team_name].members:
+            if member.pokemon.hp is None:
+                raise HTTPException(status_code=404, detail=f"Stats not found for {member.pokemon.name}")
+
+    attacks = [(member.pokemon, member_move.move)
+               for member in teams[attacker_team].members for member_move in member.team_member_moves]
+    defenders = [member.pokemon for member in teams[defender_team].members]
+    if not attacks or not defenders:
+        raise HTTPException(status_code=400, detail="Both teams need Pokémon and the attacking team needs moves")
+
+    result = damage.matchup_matrix(attacks, defenders, level)
+    return {
+        "attacks": [{"pokemon": pokemon.name, "move": move.name} for pokemon, move in attacks],
+        "defenders": [pokemon.name for pokemon in defenders],
+        "level": level,
+        **{key: values.tolist() for key, values in result.items()}
+    }
+
+# ----- SUGGEST A TEAM MEMBER -----
+@app.get("/teams/{team_name}/suggest")
+def suggest_team_member(team_name: str,
+                        k: int = Query(default=5, ge=1, le=20, description="Number of suggestions"),
+                        budget_ms: int = Query(default=None, ge=10, le=30000, description="Time budget, defaults to SUGGEST_TIME_BUDGET"),
+                        db: Session = Depends(get_db)):
+    member_options = selectinload(Team.members).options(
+        selectinload(TeamMember.pokemon),
+        selectinload(TeamMember.team_member_moves).joinedload(TeamMemberMove.move)
+    )
+    team = db.exec(select(Team).options(member_options).where(Team.name == team_name)).first()
+    if not team:
+        raise HTTPException(status_code=404, detail="Team not found")
+    if len(team.members) >= 6:
+        raise HTTPException(status_code=400, detail="Team already has six members")
+
+    members = [member.pokemon for member in team.members]
+    move_types = [damage.type_index(member_move.move.move_type) for member in team.members
+                  for member_move in member.team_member_moves
+                  if member_move.move.power and member_move.move.category != "status"]
+    profile = recommender.team_profile(
+        [damage.pokemon_type_indices(pokemon.pokemon_type) for pokemon in members],
+        [np.array([p.hp, p.atk, p.def_, p.spa, p.spd, p.spe], dtype=float) for p in members if p.hp is not None],
+        move_types
+    )
+
+    on_team = {pokemon.name for pokemon in members}
+    candidates = [candidate for candidate in recommender.candidate_pool.load(db) if candidate.name not in on_team]
+    budget = budget_ms / 1000 if budget_ms else recommender.SUGGEST_TIME_BUDGET
+    return {"team": team_name, **recommender.suggest(profile, candidates, k, budget)}
+
 # ----- GET ALL TEAMS -----
 @app.get("/teams")
-async def get_all_teams(db: Session = Depends(get_db)):
-    teams = db.exec(select(Team)).all()
-    return [{"team_id": team.id, "team_name": team.name} for team in teams]
+async def get_all_teams(request: Request,
+                        order: str = Query(default="id", pattern="^(id|name)$"),
+                        after: str = Query(default=None, description="Cursor from the previous page's X-Next-Cursor header"),
+                        prefix: str = Query(default=None, description="Only teams whose name starts with this"),
+                        limit: int = Query(default=50, ge=1, le=500),
+                        count: bool = Query(default=False, description="Add an estimated total in X-Total-Count-Estimate"),
+                        format: str = Query(default="json", pattern="^(json|ndjson)$", description="ndjson streams every match, ignoring limit"),
+                        db: Session = Depends(get_db)):
+    # Keyset pagination, so a page costs the same at the end of the table as at the start
+    if after is not None:
+        try:
+            team_listing.parse_cursor(order, after)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {}
+    if count:
+        headers["X-Total-Count-Estimate"] = str(team_listing.estimate_count(db, prefix))
+
+    if format == "ndjson":
+        body = export.encode_ndjson(team_listing.iter_teams(db, order, after, prefix))
+        if "gzip" in request.headers.get("accept-encoding", ""):
+            body = export.gzip_stream(body)
+            headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
+
+    teams, next_cursor = team_listing.page(db, order, after, prefix, limit)
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+    return JSONResponse(content=teams, headers=headers)
+
+# ----- SEARCH TEAMS BY COMPOSITION -----
+@app.get("/teams/search")
+def search_teams(species: str = Query(default=None, description="Comma separated Pokémon every team must include"),
+                 moves: str = Query(default=None, description="Comma separated moves"),
+                 items: str = Query(default=None, description="Comma separated held items"),
+                 abilities: str = Query(default=None, description="Comma separated abilities"),
+                 after: int = Query(default=None, description="Cursor from the previous page's X-Next-Cursor header"),
+                 limit: int = Query(default=50, ge=1, le=500),
+                 db: Session = Depends(get_db)):
+    """Teams containing every given component. With exactly one species, moves, items and abilities must be on that Pokémon."""
+    filters = [parse_names(value) if value else [] for value in (species, moves, items, abilities)]
+    if not any(filters):
+        raise HTTPException(status_code=400, detail="Give at least one of species, moves, items or abilities")
+
+    team_ids = team_index.search(db, *filters)
+    headers = {"X-Total-Count": str(len(team_ids))}
+    if after is not None:
+        team_ids = team_ids[team_ids.searchsorted(after, side="right"):]
+    page_ids = [int(team_id) for team_id in team_ids[:limit]]
+    names = dict(db.exec(select(Team.id, Team.name).where(Team.id.in_(page_ids))).all()) if page_ids else {}
+
+    if len(team_ids) > limit:
+        headers["X-Next-Cursor"] = str(page_ids[-1])
+    return JSONResponse(content=[{"team_id": team_id, "team_name": names[team_id]} for team_id in page_ids if team_id in names],
+                        headers=headers)
 
 # ----- GET SPECIFIC TEAM, INCLUDES POKEMON DATA -----
 @app.get("/teams/{team_name}", response_model=TeamResponse)
 async def get_team_by_name(team_name: str, db: Session = Depends(get_db)):
+    cached = cached_response('team', team_name, lambda: team_json(db, team_name))
+    if not cached:
+        raise HTTPException(status_code=404, detail="Team not found")
+    return cached
+
+def team_json(db: Session, team_name: str) -> dict | None:
     team = db.exec(select(Team).where(Team.name == team_name)).first()
     if not team:
-        raise HTTPException(status_code=404, detail="Team not found")
+        return None
 
     team_members = []
     for member in team.members:
@@ -185,7 +671,7 @@ async def get_team_by_name(team_name: str, db: Session = Depends(get_db)):
         id=team.id,
         name=team.name,
         members=team_members
-    )
+    ).model_dump()
     
 # ----- GET SPECIFIC POKEMON IN TEAM -----
 @app.get("/teams/{team_name}/pokemon/{pokemon_name}", response_model=TeamMemberResponse)
@@ -268,17 +754,12 @@ async def create_team(
     
     db: Session = Depends(get_db)
 ):
+    check_writable()
     # Check if team name already exists
     existing_team = db.exec(select(Team).where(Team.name == team_name)).first()
     if existing_team:
         raise HTTPException(status_code=400, detail="Team name already exists")
 
-    # Create new team
-    new_team = Team(name=team_name)
-    db.add(new_team)
-    db.commit()
-    db.refresh(new_team)
-
     pokemon_data = [
         (pokemon_1, pokemon_1_ability, pokemon_1_item, [pokemon_1_move_1, pokemon_1_move_2, pokemon_1_move_3, pokemon_1_move_4]),
         (pokemon_2, pokemon_2_ability, pokemon_2_item, [pokemon_2_move_1, pokemon_2_move_2, pokemon_2_move_3, pokemon_2_move_4]),
@@ -291,48 +772,26 @@ async def create_team(
     pokemon_data = [(name, ability, item, [move for move in moves if move]) 
                     for name, ability, item, moves in pokemon_data if name]
 
-    for pokemon_name, ability, item_name, moves in pokemon_data:
-        pokemon = db.exec(select(Pokemon).where(Pokemon.name == pokemon_name)).first()
-        if not pokemon:
-            raise HTTPException(status_code=404, detail=f"Pokémon {pokemon_name} not found")
-
-        if ability:
-            pokemon_abilities = pokemon.abilities.split('/')
-            if ability not in pokemon_abilities:
-                raise HTTPException(status_code=404, detail=f"{pokemon_name} cannot have the ability {ability}")
-
-        pokemon_moves = db.exec(select(Links).where(Links.pokemon_name == pokemon.name)).all()
-        pokemon_move_names = {link.move_name for link in pokemon_moves}
-
-        valid_moves = []
-        for move_name in moves:
-            if move_name not in pokemon_move_names:
-                raise HTTPException(status_code=404, detail=f"{pokemon_name} cannot learn {move_name}")
-            move = db.exec(select(Moves).where(Moves.name == move_name)).first()
-            if not move:
-                raise HTTPException(status_code=404, detail=f"{move_name} not found")
-            valid_moves.append(move)
-
-        if item_name:
-            item = db.exec(select(Item).where(Item.name == item_name)).first()
-            if not item:
-                raise HTTPException(status_code=404, detail=f"Item {item_name} not found")
-            item_id = item.id
-        else:
-            item_id = None
+    # Validate every member before writing anything so a bad member can't leave an orphan team behind
+    try:
+        members = team_writer.resolve_members(db, pokemon_data)
+    except team_writer.TeamValidationError as e:
+        raise HTTPException(status_code=404, detail=e.detail)
 
-        # Create team member and associate moves
-        team_member = TeamMember(team_id=new_team.id, pokemon_id=pokemon.natdex_id, item_id=item_id)
-        db.add(team_member)
-        db.commit()
-        db.refresh(team_member)
+    team_writer.create_team(db, team_name, members)
+    return {"message": "Team created successfully", "team_name": team_name}
 
-        for move in valid_moves:
-            team_member_move = TeamMemberMove(team_member_id=team_member.id, move_name=move.name)
-            db.add(team_member_move)
 
-    db.commit()
-    return {"message": "Team created successfully", "team_name": team_name}
+@app.post("/teams/validate", response_model=list[TeamValidationResult])
+def validate_teams(request: TeamValidationRequest, db: Session = Depends(get_db)):
+    # Checks run against the compiled reference data; the database is only touched to refresh it
+    validator.refresh(db)
+    results = []
+    for team in request.teams:
+        members = [(m.pokemon_name, m.ability, m.item_name, m.moves) for m in team.members]
+        errors = validator.check(members, species_clause=request.species_clause, item_clause=request.item_clause)
+        results.append(TeamValidationResult(name=team.name, valid=not errors, errors=errors))
+    return results
 
 
 # ----PUT REQUESTS----
@@ -391,6 +850,7 @@ async def update_team(
     
     db: Session = Depends(get_db)
 ):
+    check_writable()
     # Fetch the team by name
     team = db.exec(select(Team).where(Team.name == team_name)).first()
     if not team:
@@ -409,83 +869,13 @@ async def update_team(
     pokemon_data = [(name, ability, item, [move for move in moves if move]) 
                     for name, ability, item, moves, in pokemon_data if name]
 
-    existing_members = {member.id: member for member in team.members}
-    new_team_member_ids = set()
-
-    for i, (pokemon_name, ability_name, item_name, moves) in enumerate(pokemon_data):
-        
-        pokemon = db.exec(select(Pokemon).where(Pokemon.name == pokemon_name)).first()
-        if not pokemon:
-            raise HTTPException(status_code=404, detail=f"{pokemon_name} not found")
-
-        if ability_name:
-            pokemon_abilities = pokemon.abilities.split("/")
-            if ability_name not in pokemon_abilities:
-                raise HTTPException(status_code=404, detail=f"{pokemon_name} cannot have the ability {ability_name}")
-
-        if moves is None:
-            moves = []
-        
-        pokemon_moves = db.exec(select(Links).where(Links.pokemon_name == pokemon.name)).all()
-        pokemon_move_names = {link.move_name for link in pokemon_moves}
-        
-        valid_moves = []
-        for move_name in moves:
-            if move_name not in pokemon_move_names:
-                raise HTTPException(status_code=404, detail=f"{pokemon_name} cannot learn {move_name}")
-
-            move = db.exec(select(Moves).where(Moves.name == move_name)).first()
-            if not move:
-                raise HTTPException(status_code=404, detail=f"{move_name} not found")
-
-            valid_moves.append(move)
-
-        if item_name:
-            item = db.exec(select(Item).where(Item.name == item_name)).first()
-            if not item:
-                raise HTTPException(status_code=404, detail=f"{item_name} not found")
-            item_id = item.id
-        else:
-            item_id = None
-
-        # Determine the team member to update or create
-        if i < len(team.members):
-            team_member = team.members[i]
-            new_team_member_ids.add(team_member.id)
-        else:
-            team_member = TeamMember(team_id=team.id, pokemon_id=pokemon.natdex_id, item_id=item_id)
-            db.add(team_member)
-            new_team_member_ids.add(team_member.id)
-        
-        # Update team member details
-        team_member.pokemon_id = pokemon.natdex_id
-        team_member.item_id = item_id
-        team_member.ability = ability_name  # Set the ability for the team member
-
-        # Clear existing moves in the team context
-        db.exec(delete(TeamMemberMove).where(TeamMemberMove.team_member_id == team_member.id))
-
-        # Add new moves specific to the team member
-        for move in valid_moves:
-            team_member_move = TeamMemberMove(team_member_id=team_member.id, move_name=move.name)
-            db.add(team_member_move)
-
-    # Remove extra team members and their moves
-    extra_member_ids = set(existing_members.keys()) - new_team_member_ids
-    if extra_member_ids:
-    # Delete all associated moves for the team members being removed
-        db.exec(delete(TeamMemberMove).where(TeamMemberMove.team_member_id.in_(extra_member_ids)))
-    
-    # Delete the team members
-    db.exec(delete(TeamMember).where(TeamMember.id.in_(extra_member_ids)))
-
-    # Remove any extra team members
-    extra_member_ids = set(existing_members.keys()) - new_team_member_ids
-    if extra_member_ids:
-        db.exec(delete(TeamMember).where(TeamMember.id.in_(extra_member_ids)))
+    try:
+        members = team_writer.resolve_members(db, pokemon_data)
+    except team_writer.TeamValidationError as e:
+        raise HTTPException(status_code=404, detail=e.detail)
 
-    # Commit changes to the database
-    db.commit()
+    # Write only what changed, in a single transaction
+    team_writer.apply_team_diff(db, team, members)
     return {"message": "Team updated successfully", "team_name": team.name}
 
 
@@ -493,7 +883,7 @@ async def update_team(
 
 @app.delete("/teams/delete")
 async def delete_team(team_name: str, db: Session = Depends(get_db)):
-    
+    check_writable()
     team = db.exec(select(Team).where(Team.name == team_name)).first()
 
     if not team:
@@ -507,6 +897,8 @@ async def delete_team(team_name: str, db: Session = Depends(get_db)):
     db.exec(delete(Team).where(Team.id == team.id))
 
     db.commit()
+    bus.publish('team', team_name)
+    bus.publish('team_composition', str(team.id))
 
     return {"message": f"Team '{team_name}' deleted successfully"}
 
@@ -1,12 +1,14 @@
+from sqlalchemy import Column, Computed, Integer
 from sqlmodel import Field, SQLModel, Relationship
 from typing import Optional, List
+from pydantic import NaiveDatetime
 
 # ----- MAIN MODELS -----
 
 class Links(SQLModel, table=True):
     __tablename__ = 'links'
     pokemon_name: str = Field(foreign_key='pokemon.name', primary_key=True)
-    move_name: str = Field(foreign_key='moves.name', primary_key=True)
+    move_name: str = Field(foreign_key='moves.name', primary_key=True, index=True)  # Primary key only covers pokemon_name lookups
     pokemon: 'Pokemon' = Relationship(back_populates='moves')
     move: 'Moves' = Relationship(back_populates='pokemon')
 
@@ -16,36 +18,37 @@ class Pokemon(SQLModel, table=True):
     name: str = Field(index=True, unique=True)
     pokemon_type: str
     abilities: str
-    base_stats_id: Optional[int] = Field(default=None, foreign_key='stats.id', nullable=True)
-    base_stats: 'Stats' = Relationship(back_populates='pokemon')
+    # Base stats live on the row, so a stats read is one lookup by name. NULL until ingested
+    hp: Optional[int] = Field(default=None, nullable=True)
+    atk: Optional[int] = Field(default=None, nullable=True)
+    def_: Optional[int] = Field(default=None, nullable=True)
+    spa: Optional[int] = Field(default=None, nullable=True)
+    spd: Optional[int] = Field(default=None, nullable=True)
+    spe: Optional[int] = Field(default=None, nullable=True)
+    total: Optional[int] = Field(default=None, sa_column=Column(Integer, Computed("hp + atk + def_ + spa + spd + spe", persisted=True)))
     moves: List[Links] = Relationship(back_populates='pokemon')  
 
+    @property
+    def stats(self) -> Optional[dict]:
+        """Stats nested under "stats", the key ?include=stats and /pokemon/{name}/stats use. None until ingested."""
+        if self.hp is None:
+            return None
+        return {'hp': self.hp, 'atk': self.atk, 'def_': self.def_, 'spa': self.spa, 'spd': self.spd, 'spe': self.spe, 'total': self.total}
+
 class Moves(SQLModel, table=True):
     __tablename__ = 'moves'
     name: str = Field(default=None, primary_key=True)
-    move_type: str
-    category: str
+    move_type: str = Field(index=True)
+    category: str = Field(index=True)
     power: Optional[int] = Field(default=None, nullable=True)
     accuracy: Optional[int] = Field(default=None, nullable=True)
     description: str
     pokemon: List[Links] = Relationship(back_populates='move')  # Many-to-Many with Pokemon
 
-class Stats(SQLModel, table=True):
-    __tablename__ = 'stats'
-    id: int = Field(default=None, primary_key=True)
-    hp: int
-    atk: int
-    def_: int
-    spa: int
-    spd: int
-    spe: int
-    total: Optional[int] = Field(default=None, nullable=True)
-    pokemon: List['Pokemon'] = Relationship(back_populates='base_stats')
-
 class Item(SQLModel, table=True):
     __tablename__ = 'items'
     id: int = Field(default=None, primary_key=True)
-    name: str
+    name: str = Field(index=True, unique=True)
     description: str
 
 # ------ RESPONSE MODELS -----
@@ -81,6 +84,21 @@ class MovesResponse(SQLModel):
     
     class Config:
         from_attributes = True
+
+class PokemonWithStatsResponse(PokemonResponse):
+    stats: Optional[StatsResponse] = None
+
+class PokemonBatchResponse(SQLModel):
+    pokemon: List[PokemonWithStatsResponse]
+    not_found: List[str]
+
+class MovesBatchResponse(SQLModel):
+    moves: List[MovesResponse]
+    not_found: List[str]
+
+class ItemsBatchResponse(SQLModel):
+    items: List[Item]
+    not_found: List[str]
         
 class TeamMemberResponse(SQLModel):
     id: int
@@ -100,22 +118,42 @@ class TeamResponse(SQLModel):
     class Config:
         from_attributes = True
 
+class TeamMemberSpec(SQLModel):
+    pokemon_name: str
+    ability: Optional[str] = None
+    item_name: Optional[str] = None
+    moves: List[str] = []
+
+class TeamSpec(SQLModel):
+    name: Optional[str] = None
+    members: List[TeamMemberSpec]
+
+class TeamValidationRequest(SQLModel):
+    teams: List[TeamSpec]
+    species_clause: bool = False
+    item_clause: bool = False
+
+class TeamValidationResult(SQLModel):
+    name: Optional[str]
+    valid: bool
+    errors: List[str]
+
 # ----- TEAM MODELS ------
 
 class TeamMemberMove(SQLModel, table=True):
     __tablename__ = 'team_member_moves'
     id: Optional[int] = Field(default=None, primary_key=True)
-    team_member_id: int = Field(foreign_key="team_members.id")
-    move_name: str = Field(foreign_key="moves.name")
+    team_member_id: int = Field(foreign_key="team_members.id", index=True)
+    move_name: str = Field(foreign_key="moves.name", index=True)
     move: Moves = Relationship()
     team_member: "TeamMember" = Relationship(back_populates="team_member_moves")
 
 class TeamMember(SQLModel, table=True):
     __tablename__ = 'team_members'
     id: Optional[int] = Field(default=None, primary_key=True)
-    team_id: int = Field(foreign_key="teams.id")
-    pokemon_id: int = Field(foreign_key="pokemon.natdex_id")
-    item_id: Optional[int] = Field(foreign_key="items.id", default=None)
+    team_id: int = Field(foreign_key="teams.id", index=True)
+    pokemon_id: int = Field(foreign_key="pokemon.natdex_id", index=True)
+    item_id: Optional[int] = Field(foreign_key="items.id", default=None, index=True)
     ability: Optional[str] = Field(default=None)
     team: "Team" = Relationship(back_populates="members")
     pokemon: Pokemon = Relationship()
@@ -127,5 +165,50 @@ class Team(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(index=True)
     members: List[TeamMember] = Relationship(back_populates="team")
-    
 
+# ----- SYNC MODELS -----
+
+class UpstreamSync(SQLModel, table=True):
+    __tablename__ = 'upstream_sync'
+    kind: str = Field(primary_key=True)  # pokemon, move or item
+    name: str = Field(primary_key=True)
+    upstream_name: str
+    content_hash: Optional[str] = Field(default=None)  # Hash of the fields we store, not of the whole upstream body
+    etag: Optional[str] = Field(default=None)
+    last_modified: Optional[str] = Field(default=None)
+    fetched_at: Optional[NaiveDatetime] = Field(default=None)  # Naive UTC, like the job timestamps
+    checked_at: Optional[NaiveDatetime] = Field(default=None, index=True)
+
+# ----- JOB MODELS -----
+
+class IngestionJob(SQLModel, table=True):
+    __tablename__ = 'ingestion_jobs'
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(index=True)  # pokemon, move or item
+    name: str = Field(index=True)
+    status: str = Field(default="queued", index=True)  # queued, running, done or failed
+    attempts: int = Field(default=0)
+    error: Optional[str] = Field(default=None)
+    owner: Optional[str] = Field(default=None)  # Process running the job, while it holds the lease
+    heartbeat_at: Optional[NaiveDatetime] = Field(default=None)  # Last lease renewal by the owner
+    # The columns are timestamp without time zone, so these hold naive UTC
+    created_at: NaiveDatetime
+    started_at: Optional[NaiveDatetime] = Field(default=None)
+    finished_at: Optional[NaiveDatetime] = Field(default=None)
+
+class IngestionJobResponse(SQLModel):
+    id: int
+    kind: str
+    name: str
+    status: str
+    error: Optional[str]
+    status_url: str
+    resource_url: Optional[str]
+
+class IngestionPlanResponse(SQLModel):
+    pokemon: str
+    pokemon_exists: bool
+    known_moves: List[str]
+    missing_moves: List[str]
+    fetches: int
+    inserts: int
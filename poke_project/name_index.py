@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+from sqlmodel import Session, select
+
+from models import Pokemon, Moves, Item
+from shared_cache import CACHE_TTL
+
+KINDS = ("pokemon", "move", "item")
+SIMILARITY_THRESHOLD = 0.3  # Same default as pg_trgm
+
+
+def trigrams(text: str) -> set[str]:
+    """pg_trgm style trigrams: each word padded with two leading spaces and one trailing space."""
+    grams = set()
+    for word in text.lower().split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NameIndex:
+    """In-memory autocomplete index over Pokémon, move and item names.
+
+    A prefix trie answers "starts with" queries (on the full name and on each
+    word in it), and a trigram posting index answers near-miss queries.
+    Names ingested by other workers are picked up by reloading once the index is older than ttl.
+    """
+
+    def __init__(self, ttl: int = CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._trie = {}
+            self._trigrams = defaultdict(set)
+            self._entry_trigrams = {}
+            self.loaded = False
+            self.loaded_at = 0.0
+
+    def add(self, kind: str, name: str):
+        entry = (kind, name)
+        key = name.lower()
+        with self._lock:
+            if entry in self._entry_trigrams:
+                return
+            # Index the full name and every word start so "attack" finds "quick attack"
+            starts = [0] + [i + 1 for i, char in enumerate(key) if char == " "]
+            for start in starts:
+                node = self._trie
+                for char in key[start:]:
+                    node = node.setdefault(char, {})
+                node.setdefault(None, set()).add(entry)
+
+            entry_trigrams = trigrams(key)
+            self._entry_trigrams[entry] = entry_trigrams
+            for gram in entry_trigrams:
+                self._trigrams[gram].add(entry)
+
+    def load(self, db: Session):
+        for name in db.exec(select(Pokemon.name)).all():
+            self.add("pokemon", name)
+        for name in db.exec(select(Moves.name)).all():
+            self.add("move", name)
+        for name in db.exec(select(Item.name)).all():
+            self.add("item", name)
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+
+    def ensure_loaded(self, db: Session):
+        # Reference rows are never renamed or removed, so reloading only has to add; add() skips known names
+        if not self.loaded or time.monotonic() - self.loaded_at > self.ttl:
+            self.load(db)
+
+    def _prefix_matches(self, prefix: str, kinds: set, limit: int) -> list[tuple]:
+        node = self._trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+
+        # Breadth-first so shorter completions come out first
+        matches, seen = [], set()
+        queue = [node]
+        while queue and len(matches) < limit:
+            next_queue = []
+            for current in queue:
+                for child_key, child in current.items():
+                    if child_key is None:
+                        for entry in sorted(child):
+                            if entry[0] in kinds and entry not in seen:
+                                seen.add(entry)
+                                matches.append(entry)
+                    else:
+                        next_queue.append(child)
+            queue = next_queue
+        return matches[:limit]
+
+    def search(self, query: str, kinds: Optional[set] = None, limit: int = 10) -> list[dict]:
+        query = " ".join(query.lower().split())
+        if not query:
+            return []
+        kinds = kinds or set(KINDS)
+
+        with self._lock:
+            results = []
+            seen = set()
+            for kind, name in self._prefix_matches(query, kinds, limit):
+                seen.add((kind, name))
+                exact = name.lower() == query
+                results.append({"name": name, "kind": kind, "score": 1.0 if exact else round(0.99 - len(name) * 0.001, 3)})
+
+            if len(results) < limit:
+                query_trigrams = trigrams(query)
+                shared = defaultdict(int)
+                for gram in query_trigrams:
+                    for entry in self._trigrams.get(gram, ()):
+                        if entry[0] in kinds and entry not in seen:
+                            shared[entry] += 1
+
+                fuzzy = []
+                for entry, count in shared.items():
+                    similarity = count / (len(query_trigrams) + len(self._entry_trigrams[entry]) - count)
+                    if similarity >= SIMILARITY_THRESHOLD:
+                        fuzzy.append((similarity, entry))
+                fuzzy.sort(key=lambda match: (-match[0], match[1][1]))
+
+                for similarity, (kind, name) in fuzzy[:limit - len(results)]:
+                    results.append({"name": name, "kind": kind, "score": round(similarity * 0.9, 3)})
+
+        return results
+
+
+name_index = NameIndex()
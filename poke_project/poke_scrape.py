@@ -1,54 +1,75 @@
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+import uuid
+
 import requests
 from bs4 import BeautifulSoup
-import json
+
+DEFAULT_DEXES = ["https://pokemondb.net/pokedex/game/scarlet-violet/indigo-disk"]
+STATE_DIR = ".scrape_state"
+
+
+def pokemon_url(pokemon_name):
+    return f"https://pokemondb.net/pokedex/{pokemon_name}".replace(' ', '-').replace('é', 'e')
+
+
+def dex_url(dex):
+    # Accept full urls or paths like game/scarlet-violet/indigo-disk
+    return dex if dex.startswith("http") else f"https://pokemondb.net/pokedex/{dex.strip('/')}"
 
 
 def scrape_data(pokemon_name):
-    url = f"https://pokemondb.net/pokedex/{pokemon_name}".replace(' ', '-').replace('é', 'e')
-    response = requests.get(url)
+    response = requests.get(pokemon_url(pokemon_name))
     
     if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        pokemon_data = {}
-        
-        # Scrape Pokédex data
-        pokemon_tables = soup.find_all(class_='vitals-table')
-        moves_tables = soup.find_all(class_='data-table')
-        
-        natdex_id, types, height, weight, abilities = scrape_pokedex_data(pokemon_tables)
-        
-        # Combine all scraped data into a dictionary
-        pokemon_data['National Dex Number'] = natdex_id
-        pokemon_data['Name'] = pokemon_name.capitalize().replace('é', 'e')
-        pokemon_data['Types'] = types
-        pokemon_data['Height'] = height.replace('′', '`').replace('″', "'")
-        pokemon_data['Weight'] = weight
-        pokemon_data['Abilities'] = abilities
-        
-        # Scrape and add base stats
-        hp, atk, _def, spa, spd, spe, total = scrape_base_stats(pokemon_tables)
-        pokemon_data['Base Stats'] = {
-            "HP": hp,
-            "Atk": atk,
-            "Def": _def,
-            "Spa": spa,
-            "Spd": spd,
-            "Spe": spe,
-            "Total": total
-        }
-        
-        # Scrape and add moves
-        moves = scrape_pokemon_moves(moves_tables)
-        pokemon_data['Moves'] = moves
-        
-        return pokemon_data
-        
+        return parse_pokemon_page(pokemon_name, response.text)
     else:
         print(f"Failed to fetch data for {pokemon_name}")
         return None
 
 
+def parse_pokemon_page(pokemon_name, html):
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    pokemon_data = {}
+    
+    # Scrape Pokédex data
+    pokemon_tables = soup.find_all(class_='vitals-table')
+    moves_tables = soup.find_all(class_='data-table')
+    
+    natdex_id, types, height, weight, abilities = scrape_pokedex_data(pokemon_tables)
+    
+    # Combine all scraped data into a dictionary
+    pokemon_data['National Dex Number'] = natdex_id
+    pokemon_data['Name'] = pokemon_name.capitalize().replace('é', 'e')
+    pokemon_data['Types'] = types
+    pokemon_data['Height'] = height.replace('′', '`').replace('″', "'")
+    pokemon_data['Weight'] = weight
+    pokemon_data['Abilities'] = abilities
+    
+    # Scrape and add base stats
+    hp, atk, _def, spa, spd, spe, total = scrape_base_stats(pokemon_tables)
+    pokemon_data['Base Stats'] = {
+        "HP": hp,
+        "Atk": atk,
+        "Def": _def,
+        "Spa": spa,
+        "Spd": spd,
+        "Spe": spe,
+        "Total": total
+    }
+    
+    # Scrape and add moves
+    moves = scrape_pokemon_moves(moves_tables)
+    pokemon_data['Moves'] = moves
+    
+    return pokemon_data
+
+
 def scrape_pokedex_data(pokemon_tables):
     pokemon_vitals = pokemon_tables[0]
     data_cell = pokemon_vitals.find_all('td')
@@ -116,35 +137,177 @@ def scrape_pokemon_moves(moves_tables):
     return all_moves
 
 
-def main():
-    url = "https://pokemondb.net/pokedex/game/scarlet-violet/indigo-disk"
-    response = requests.get(url)
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Extracting names of all Pokemon on the page
-        pokemon_names_list = [a.text.lower() for a in soup.find_all('a', class_='ent-name')]
-       
-        # Fetching data for each Pokemon
-        all_pokemon_data = []
-        for pokemon_name in pokemon_names_list:
-            pokemon_data = scrape_data(pokemon_name) 
-            if pokemon_data:
-                all_pokemon_data.append(pokemon_data)
-        
-        # Saving data to a JSON file
-        with open('indigo_disk_data.json', 'w') as json_file:
-            json.dump(all_pokemon_data, json_file, indent=4)
-        
-        print("Data saved")
+def parse_dex_page(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    return [a.text.lower() for a in soup.find_all('a', class_='ent-name')]
+
+
+# ----- CRAWL STATE -----
+
+class CrawlState:
+    """What the last crawls saw, kept on disk so the next one only re-parses what changed.
+
+    dexes/ and pages/ hold one small JSON file per url with the content hash and validators from the
+    last fetch (plus the scraped data for Pokémon pages). run.json holds the frontier of the crawl in
+    progress and is removed when it finishes, so an interrupted crawl resumes where it stopped.
+    Every file is written to a temp file and renamed into place, so a kill never leaves a torn entry.
+    """
+
+    def __init__(self, root=STATE_DIR):
+        self.root = root
+
+    def _path(self, kind, url):
+        return os.path.join(self.root, kind, hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def _read(self, path):
+        try:
+            with open(path) as state_file:
+                return json.load(state_file)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path, entry):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "w") as tmp_file:
+            json.dump(entry, tmp_file)
+        os.replace(tmp_path, path)
+
+    def get(self, kind, url):
+        return self._read(self._path(kind, url))
+
+    def put(self, kind, url, entry):
+        self._write(self._path(kind, url), entry)
+
+    def current_run(self):
+        return self._read(os.path.join(self.root, "run.json"))
+
+    def start_run(self, dexes, frontier):
+        run = {"id": uuid.uuid4().hex, "dexes": dexes, "frontier": frontier, "started_at": time.time()}
+        self._write(os.path.join(self.root, "run.json"), run)
+        return run
+
+    def finish_run(self):
+        os.remove(os.path.join(self.root, "run.json"))
+
+
+def fetch_if_changed(url, entry):
+    """Conditional GET against the last fetch. Returns (status, body, content hash, validators);
+    body is None when the page is unchanged, whether the server said 304 or the content hashes match."""
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    response = requests.get(url, headers=headers)
+
+    if response.status_code == 304 and entry:
+        return "unchanged", None, entry["hash"], {"etag": entry.get("etag"), "last_modified": entry.get("last_modified")}
+    if response.status_code != 200:
+        return "failed", None, None, {}
+
+    content_hash = hashlib.sha256(response.text.encode()).hexdigest()
+    validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+    if entry and entry.get("hash") == content_hash:
+        return "unchanged", None, content_hash, validators
+    return "changed", response.text, content_hash, validators
+
+
+# ----- CRAWL -----
+
+def build_frontier(state, dexes):
+    """Every Pokémon on any of the dex pages, once each, in first-seen order."""
+    frontier = {}
+    for url in dexes:
+        entry = state.get("dexes", url)
+        status, html, content_hash, validators = fetch_if_changed(url, entry)
+        if status == "failed":
+            if not entry:
+                print(f"Failed to fetch dex {url}")
+                continue
+            print(f"Failed to fetch dex {url}, using the Pokémon seen last time")
+            names = entry["pokemon"]
+        elif status == "unchanged":
+            names = entry["pokemon"]
+        else:
+            names = parse_dex_page(html)
+        if status != "failed":
+            state.put("dexes", url, {"url": url, "hash": content_hash, **validators, "pokemon": names, "fetched_at": time.time()})
+        for name in names:
+            frontier.setdefault(pokemon_url(name), name)
+    return list(frontier.values())
+
+
+def crawl(dexes, state):
+    """Scrape every Pokémon on the given dex pages, re-parsing only pages whose content changed.
+
+    Returns the scraped data for the whole frontier and counts of changed, unchanged and failed pages,
+    or no counts when the dex pages listed nothing."""
+    run = state.current_run()
+    if run and run["dexes"] == dexes:
+        print(f"Resuming crawl of {len(run['frontier'])} Pokémon")
     else:
-        print("Failed to fetch data from the URL")
+        run = state.start_run(dexes, build_frontier(state, dexes))
+    if not run["frontier"]:
+        state.finish_run()
+        return [], None
 
+    counts = {"changed": 0, "unchanged": 0, "failed": 0, "resumed": 0}
+    for pokemon_name in run["frontier"]:
+        url = pokemon_url(pokemon_name)
+        entry = state.get("pages", url)
+        if entry and entry.get("run") == run["id"]:
+            counts["resumed"] += 1
+            continue
 
-if __name__ == "__main__":
-    main()
+        status, html, content_hash, validators = fetch_if_changed(url, entry)
+        if status == "failed":
+            print(f"Failed to fetch data for {pokemon_name}")
+            counts["failed"] += 1
+            continue
+        if status == "unchanged":
+            data = entry["data"]
+        else:
+            try:
+                data = parse_pokemon_page(pokemon_name, html)
+            except Exception as e:
+                # Not recorded, so the next crawl retries it and the data from the last good parse is kept
+                print(f"Failed to parse the page for {pokemon_name}: {e!r}")
+                counts["failed"] += 1
+                continue
+        state.put("pages", url, {"url": url, "hash": content_hash, **validators, "run": run["id"],
+                                 "fetched_at": time.time(), "data": data})
+        counts[status] += 1
 
-   
+    all_pokemon_data = []
+    for pokemon_name in run["frontier"]:
+        entry = state.get("pages", pokemon_url(pokemon_name))
+        if entry and entry.get("data"):
+            all_pokemon_data.append(entry["data"])
+    state.finish_run()
+    return all_pokemon_data, counts
 
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape Pokémon from pokemondb dex pages")
+    parser.add_argument("dexes", nargs="*", help="Dex index urls or paths such as game/scarlet-violet/indigo-disk")
+    parser.add_argument("--output", default="indigo_disk_data.json")
+    parser.add_argument("--state", default=STATE_DIR, help="Crawl state directory")
+    args = parser.parse_args(argv)
 
+    dexes = [dex_url(dex) for dex in args.dexes] or DEFAULT_DEXES
+    all_pokemon_data, counts = crawl(dexes, CrawlState(args.state))
+    if counts is None:
+        print("Failed to find any Pokémon on the dex pages")
+        return
+
+    # Saving data to a JSON file
+    with open(args.output, 'w') as json_file:
+        json.dump(all_pokemon_data, json_file, indent=4)
+
+    print(f"Data saved: {counts['changed']} changed, {counts['unchanged']} unchanged, "
+          f"{counts['resumed']} already crawled, {counts['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
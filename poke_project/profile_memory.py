@@ -0,0 +1,240 @@
+"""Run memory-hungry paths on offline fixtures under tracemalloc and compare their peaks with stored baselines.
+
+Scenarios: ingest (insert_pokemon_data from a pre-filled upstream cache), scrape (a fresh poke_scrape crawl of
+canned HTML) and moves_response (large /moves pages and a full /export/moves stream).
+
+Run with: python profile_memory.py [scenario ...] [--update] [--threshold 0.2] [--top 10]
+Exits non-zero when a scenario's peak grows past its baseline by more than the threshold.
+"""
+import argparse
+import contextlib
+import gc
+import json
+import logging
+import os
+import sys
+import tempfile
+import tracemalloc
+from collections import Counter
+from unittest import mock
+
+# The scenarios bring their own SQLite databases, so the app's configured database is never touched
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from decouple import config
+from sqlmodel import Session, SQLModel, create_engine
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "memory_baselines.json")
+REGRESSION_THRESHOLD = config("MEMORY_REGRESSION_THRESHOLD", default=0.2, cast=float)  # Allowed peak growth over baseline
+
+FIXTURE_POKEMON = 20
+FIXTURE_MOVES = 300
+MOVES_PER_POKEMON = 150
+RESPONSE_MOVES = 5000
+
+TYPES = ["normal", "fire", "water", "electric", "grass", "ice"]
+
+
+# ----- FIXTURES -----
+
+def fixture_move(i: int) -> dict:
+    return {"name": f"move-{i}", "type": {"name": TYPES[i % len(TYPES)]}, "damage_class": {"name": "physical" if i % 2 else "special"},
+            "power": 40 + i % 80, "accuracy": 100, "effect_entries": [{"short_effect": f"Fixture move number {i}."}]}
+
+
+def fixture_pokemon(i: int) -> dict:
+    return {"id": i + 1, "name": f"pokemon-{i}", "types": [{"type": {"name": TYPES[i % len(TYPES)]}}],
+            "abilities": [{"ability": {"name": "fixture-ability"}}],
+            "stats": [{"base_stat": 50 + i + j} for j in range(6)],
+            "moves": [{"move": {"name": f"move-{(i * 7 + j) % FIXTURE_MOVES}"}} for j in range(MOVES_PER_POKEMON)]}
+
+
+def fixture_index_html(names: list[str]) -> str:
+    return "<html><body>" + "".join(f'<a class="ent-name" href="/pokedex/{name}">{name}</a>' for name in names) + "</body></html>"
+
+
+def fixture_pokemon_html(name: str) -> str:
+    vitals = ("<table class='vitals-table'><tr><td>0025</td><td><a>Electric</a></td><td>x</td><td>0.4 m (1′04″)</td>"
+              "<td>6.0 kg (13.2 lbs)</td><td><a>Static</a></td></tr></table>")
+    stats = "<table class='vitals-table'>" + "".join(f"<tr><td>{50 + i}</td><td></td><td></td><td></td></tr>" for i in range(7)) + "</table>"
+    filler = "<table class='vitals-table'><tr><td></td></tr></table>"
+    rows = "".join(f"<tr><td>{i}</td><td>Move {i}</td><td>Normal</td><td data-sort-value='physical'></td><td>{40 + i}</td><td>100</td></tr>"
+                   for i in range(MOVES_PER_POKEMON))
+    moves = f"<table class='data-table'><tr><th>Lv.</th></tr>{rows}</table>" * 2 + "<table class='data-table'></table>"
+    return f"<html><body>{vitals}{filler}{filler}{stats}{moves}</body></html>"
+
+
+def sqlite_engine(workdir: str):
+    engine = create_engine(f"sqlite:///{os.path.join(workdir, 'profile.db')}")
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+# ----- SCENARIOS -----
+# Each prepares its fixtures outside the measurement and returns the callable that is measured
+
+def prepare_ingest(workdir: str, stack: contextlib.ExitStack):
+    import api_insertion
+    from upstream import ResponseCache, UpstreamClient
+
+    offline_client = UpstreamClient("http://fixtures.invalid/api/v2/", ResponseCache(os.path.join(workdir, "cache")), offline=True)
+    for i in range(FIXTURE_MOVES):
+        offline_client.cache.store(offline_client.url_for("move", f"move-{i}"), json.dumps(fixture_move(i)).encode(), None, None)
+    for i in range(FIXTURE_POKEMON):
+        offline_client.cache.store(offline_client.url_for("pokemon", f"pokemon-{i}"), json.dumps(fixture_pokemon(i)).encode(), None, None)
+    stack.enter_context(mock.patch.object(api_insertion, "client", offline_client))
+    engine = sqlite_engine(workdir)
+
+    def run():
+        with Session(engine) as session:
+            for i in range(FIXTURE_POKEMON):
+                api_insertion.insert_pokemon_data(api_insertion.fetch_data("pokemon", f"pokemon-{i}"), session)
+    return run
+
+
+def prepare_scrape(workdir: str, stack: contextlib.ExitStack):
+    import poke_scrape
+
+    names = [f"pokemon-{i}" for i in range(FIXTURE_POKEMON)]
+    pages = {name: fixture_pokemon_html(name) for name in names}
+
+    def fake_get(url, *args, **kwargs):
+        slug = url.rstrip("/").rsplit("/", 1)[-1]
+        return mock.Mock(status_code=200, text=pages.get(slug) or fixture_index_html(names), headers={})
+
+    stack.enter_context(mock.patch.object(poke_scrape.requests, "get", side_effect=fake_get))
+    stack.enter_context(contextlib.chdir(workdir))
+    stack.enter_context(contextlib.redirect_stdout(open(os.devnull, "w")))
+    return lambda: poke_scrape.main([])
+
+
+def prepare_moves_response(workdir: str, stack: contextlib.ExitStack):
+    from fastapi.testclient import TestClient
+    from api_insertion import move_fields
+    from database import get_db
+    from main import app
+    from models import Moves
+
+    engine = sqlite_engine(workdir)
+    with Session(engine) as session:
+        session.add_all([Moves(**move_fields(fixture_move(i))) for i in range(RESPONSE_MOVES)])
+        session.commit()
+
+    def override_get_db():
+        with Session(engine) as session:
+            yield session
+
+    stack.enter_context(mock.patch.dict(app.dependency_overrides, {get_db: override_get_db}))
+    # Not entered as a context manager, so the app's startup hooks never touch its own database
+    client = TestClient(app)
+
+    def run():
+        for offset in range(0, RESPONSE_MOVES, 100):
+            client.get("/moves", params={"limit": 100, "offset": offset}).raise_for_status()
+        client.get("/export/moves").raise_for_status()
+    return run
+
+
+SCENARIOS = {
+    "ingest": prepare_ingest,
+    "scrape": prepare_scrape,
+    "moves_response": prepare_moves_response,
+}
+
+
+# ----- MEASUREMENT -----
+
+def object_counts() -> Counter:
+    gc.collect()
+    return Counter(type(obj).__name__ for obj in gc.get_objects())
+
+
+def profile(name: str, top: int = 10) -> dict:
+    """Run one scenario under tracemalloc. Reports peak traced memory, the largest allocation sites
+    still held when it finished, and which object types grew."""
+    with tempfile.TemporaryDirectory() as workdir, contextlib.ExitStack() as stack:
+        run = SCENARIOS[name](workdir, stack)
+        before = object_counts()
+
+        tracemalloc.start()
+        try:
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+
+        growth = object_counts() - before
+    sites = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)]).statistics("lineno")[:top]
+    return {
+        "peak_bytes": peak,
+        "top_sites": [{"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", "bytes": stat.size, "count": stat.count}
+                      for stat in sites],
+        "object_growth": dict(growth.most_common(top)),
+    }
+
+
+def load_baselines(path: str = BASELINE_PATH) -> dict:
+    try:
+        with open(path) as baseline_file:
+            return json.load(baseline_file)
+    except FileNotFoundError:
+        return {}
+
+
+def regressions(results: dict, baselines: dict, threshold: float = REGRESSION_THRESHOLD) -> list[str]:
+    failures = []
+    for name, result in results.items():
+        baseline = baselines.get(name, {}).get("peak_bytes")
+        if baseline and result["peak_bytes"] > baseline * (1 + threshold):
+            failures.append(f"{name}: peak {result['peak_bytes'] / 2**20:.1f} MiB is more than {threshold:.0%} "
+                            f"over the {baseline / 2**20:.1f} MiB baseline")
+    return failures
+
+
+def report(name: str, result: dict, baseline: dict):
+    peak = result["peak_bytes"] / 2**20
+    line = f"{name}: peak {peak:.2f} MiB"
+    if baseline.get("peak_bytes"):
+        line += f" (baseline {baseline['peak_bytes'] / 2**20:.2f} MiB, {result['peak_bytes'] / baseline['peak_bytes'] - 1:+.1%})"
+    print(line)
+    for site in result["top_sites"]:
+        print(f"    {site['bytes'] / 1024:10.1f} KiB {site['count']:8d} blocks  {site['site']}")
+    if result["object_growth"]:
+        print("    objects left behind: " + ", ".join(f"{kind} +{count}" for kind, count in result["object_growth"].items()))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", metavar="scenario", help=f"Any of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--update", action="store_true", help="Write the measured peaks as the new baselines")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--top", type=int, default=10, help="Allocation sites and object types to show")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenario {', '.join(sorted(unknown))}")
+
+    # Log records would be allocated inside the measurement and drown out the report
+    logging.disable(logging.INFO)
+    baselines = load_baselines()
+    results = {name: profile(name, args.top) for name in args.scenarios or SCENARIOS}
+    for name, result in results.items():
+        report(name, result, baselines.get(name, {}))
+
+    if args.update:
+        baselines.update({name: {"peak_bytes": result["peak_bytes"]} for name, result in results.items()})
+        with open(BASELINE_PATH, "w") as baseline_file:
+            json.dump(baselines, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+        print(f"Baselines written to {BASELINE_PATH}")
+        return 0
+
+    failures = regressions(results, baselines, args.threshold)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+import heapq
+import itertools
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from dataclasses import dataclass
+
+import numpy as np
+from decouple import config
+from sqlmodel import Session, select
+
+from damage import EFFECTIVENESS, NO_TYPE, TYPES, pokemon_type_indices, type_index
+from models import Links, Moves, Pokemon
+from shared_cache import CACHE_TTL
+
+SUGGEST_TIME_BUDGET = config("SUGGEST_TIME_BUDGET", default=2.0, cast=float)  # Seconds before returning the best found so far
+SUGGEST_WORKERS = config("SUGGEST_WORKERS", default=4, cast=int)
+SUGGEST_PARALLEL_THRESHOLD = config("SUGGEST_PARALLEL_THRESHOLD", default=400, cast=int)  # Candidates worth shipping to the process pool
+
+logger = logging.getLogger(__name__)
+
+# Score weights
+DEFENSE_WEIGHT = 1.0  # Per attacking type the team is weak to that the candidate resists
+DEFENSE_PENALTY = 0.5  # Per attacking type the candidate is weak to that the team doesn't already resist
+COVERAGE_WEIGHT = 1.0  # Per defending type newly hit super effectively
+STAB_WEIGHT = 0.25  # Per move sharing a type with the candidate
+POWER_WEIGHT = 0.5  # Times the move set's mean power / 100
+STAT_WEIGHT = 1.0  # Times base stat total / 600, plus the team's weakest stat / 150
+
+TYPE_COUNT = len(TYPES)
+# Bit d set in SUPER_EFFECTIVE[t] when attacking type t hits mono-type d for 2x or more
+SUPER_EFFECTIVE = np.array([sum(1 << d for d in range(TYPE_COUNT) if EFFECTIVENESS[t, d] >= 2) for t in range(TYPE_COUNT + 1)],
+                           dtype=np.int64)
+POPCOUNT = np.array([bin(mask).count("1") for mask in range(1 << TYPE_COUNT)], dtype=np.int64)
+
+_COMBINATIONS = {}
+
+
+def combinations(n: int) -> np.ndarray:
+    if n not in _COMBINATIONS:
+        _COMBINATIONS[n] = np.array(list(itertools.combinations(range(n), min(n, 4))), dtype=np.int64).reshape(-1, min(n, 4))
+    return _COMBINATIONS[n]
+
+
+def defensive_multipliers(types: np.ndarray) -> np.ndarray:
+    """(N, 2) type indices to (N, 18) damage taken from each attacking type."""
+    return EFFECTIVENESS[:TYPE_COUNT, types[:, 0]].T * EFFECTIVENESS[:TYPE_COUNT, types[:, 1]].T
+
+
+# ----- CANDIDATE DATA -----
+
+@dataclass
+class Candidate:
+    name: str
+    types: tuple[int, int]
+    stats: np.ndarray  # hp, atk, def, spa, spd, spe
+    moves: list[tuple[str, int, int]]  # Strongest damaging move per type: (name, type index, power)
+
+
+class CandidatePool:
+    """Every Pokémon with stats and its damaging learnset, loaded once and dropped when reference data changes
+    or, for changes made by other workers, once older than ttl."""
+
+    def __init__(self, ttl: int = CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._candidates = None
+        self._loaded_at = 0.0
+
+    def invalidate(self, *args):
+        self._candidates = None
+
+    def load(self, db: Session) -> list[Candidate]:
+        candidates = self._candidates
+        if candidates is not None and time.monotonic() - self._loaded_at <= self.ttl:
+            return candidates
+
+        rows = db.exec(select(Pokemon.name, Pokemon.pokemon_type, Pokemon.hp, Pokemon.atk, Pokemon.def_, Pokemon.spa, Pokemon.spd, Pokemon.spe)
+                       .where(Pokemon.hp.is_not(None))).all()
+        best_moves = {}
+        for pokemon_name, move_name, move_type, category, power in db.exec(
+                select(Links.pokemon_name, Moves.name, Moves.move_type, Moves.category, Moves.power)
+                .join(Moves, Moves.name == Links.move_name)
+                .where(Moves.power > 0, Moves.category != "status")):
+            key = (pokemon_name, type_index(move_type))
+            if key[1] != NO_TYPE and power > best_moves.get(key, ("", 0))[1]:
+                best_moves[key] = (move_name, power)
+
+        learnsets = {}
+        for (pokemon_name, move_type), (move_name, power) in best_moves.items():
+            learnsets.setdefault(pokemon_name, []).append((move_name, move_type, power))
+
+        candidates = [Candidate(name=row[0], types=pokemon_type_indices(row[1]), stats=np.array(row[2:], dtype=float),
+                                moves=sorted(learnsets.get(row[0], []), key=lambda move: move[1]))
+                      for row in rows]
+        with self._lock:
+            self._candidates = candidates
+            self._loaded_at = time.monotonic()
+        return candidates
+
+
+candidate_pool = CandidatePool()
+
+
+# ----- SCORING -----
+
+@dataclass
+class TeamProfile:
+    weak: np.ndarray  # (18,) members weak minus members resisting, per attacking type
+    coverage: int  # Bitmask of mono-types the team already hits super effectively
+    weakest_stat: int  # Index into hp..spe of the team's lowest mean stat
+
+
+def team_profile(member_types: list[tuple[int, int]], member_stats: list[np.ndarray], move_types: list[int]) -> TeamProfile:
+    multipliers = defensive_multipliers(np.array(member_types, dtype=np.int64).reshape(-1, 2))
+    weak = (multipliers > 1).sum(axis=0) - (multipliers < 1).sum(axis=0)
+    coverage = int(np.bitwise_or.reduce(SUPER_EFFECTIVE[move_types])) if move_types else 0
+    weakest = int(np.argmin(np.mean(member_stats, axis=0))) if member_stats else 5
+    return TeamProfile(weak=weak, coverage=coverage, weakest_stat=weakest)
+
+
+def base_scores(profile: TeamProfile, types: np.ndarray, stats: np.ndarray) -> np.ndarray:
+    """Defensive and stat score for N candidates at once; neither depends on the move set."""
+    multipliers = defensive_multipliers(types)
+    team_weak = profile.weak[None, :] > 0
+    defense = DEFENSE_WEIGHT * ((multipliers < 1) & team_weak).sum(axis=1) + 0.5 * DEFENSE_WEIGHT * ((multipliers == 0) & team_weak).sum(axis=1)
+    defense -= DEFENSE_PENALTY * ((multipliers > 1) & (profile.weak[None, :] >= 0)).sum(axis=1)
+    stat = STAT_WEIGHT * (stats.sum(axis=1) / 600 + stats[:, profile.weakest_stat] / 150)
+    return defense + stat
+
+
+def offense_bound(coverage: int, candidate: Candidate) -> float:
+    """Most any four moves from this learnset could add: all of its coverage, four STAB moves, its four strongest moves."""
+    if not candidate.moves:
+        return 0.0
+    move_types = [move[1] for move in candidate.moves]
+    reachable = int(np.bitwise_or.reduce(SUPER_EFFECTIVE[move_types])) & ~coverage
+    powers = sorted((move[2] for move in candidate.moves), reverse=True)[:4]
+    stab = min(4, sum(move_type in candidate.types for move_type in move_types))
+    return COVERAGE_WEIGHT * POPCOUNT[reachable] + STAB_WEIGHT * stab + POWER_WEIGHT * (sum(powers) / len(powers)) / 100
+
+
+def best_move_set(coverage: int, types: tuple[int, int], moves: list[tuple[str, int, int]]) -> tuple[float, list[int]]:
+    """Score every four-move combination at once and return the best score and move indices."""
+    if not moves:
+        return 0.0, []
+    combos = combinations(len(moves))
+    move_types = np.array([move[1] for move in moves], dtype=np.int64)
+    powers = np.array([move[2] for move in moves], dtype=float)
+    stab = np.isin(move_types, types).astype(float)
+
+    masks = np.bitwise_or.reduce(SUPER_EFFECTIVE[move_types][combos], axis=1) & ~coverage
+    scores = (COVERAGE_WEIGHT * POPCOUNT[masks] + STAB_WEIGHT * stab[combos].sum(axis=1)
+              + POWER_WEIGHT * powers[combos].mean(axis=1) / 100)
+    best = int(np.argmax(scores))
+    return float(scores[best]), combos[best].tolist()
+
+
+def _score_chunk(coverage: int, items: list[tuple[int, float, tuple[int, int], list]]) -> list[tuple[float, int, list[int]]]:
+    # Runs in the process pool, so it only takes and returns plain values
+    results = []
+    for index, base, types, moves in items:
+        offense, chosen = best_move_set(coverage, types, moves)
+        results.append((base + offense, index, chosen))
+    return results
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def process_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Forking a server process copies its locks mid-use (DB pools, job and listener threads), which
+            # can deadlock the child; spawned workers start clean and only import this module
+            _pool = ProcessPoolExecutor(max_workers=SUGGEST_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def suggest(profile: TeamProfile, candidates: list[Candidate], k: int, budget: float = SUGGEST_TIME_BUDGET) -> dict:
+    """Top k candidates by base score plus best move set, using branch and bound.
+
+    Candidates are visited by upper bound (exact base score plus offense bound). Once the k-th best
+    exact score beats the next bound nothing later can make the top k, so the search stops there."""
+    deadline = time.monotonic() + budget
+    if not candidates:
+        return {"suggestions": [], "evaluated": 0, "pruned": 0, "complete": True}
+
+    types = np.array([candidate.types for candidate in candidates], dtype=np.int64)
+    stats = np.vstack([candidate.stats for candidate in candidates])
+    base = base_scores(profile, types, stats)
+    bounds = base + np.array([offense_bound(profile.coverage, candidate) for candidate in candidates])
+    order = np.argsort(-bounds, kind="stable")
+
+    top = []  # Min-heap of (score, index, move indices)
+    evaluated = 0
+    complete = True
+
+    def kth_best():
+        return top[0][0] if len(top) >= k else float("-inf")
+
+    def offer(results):
+        nonlocal evaluated
+        for result in results:
+            evaluated += 1
+            if len(top) < k:
+                heapq.heappush(top, result)
+            elif result[0] > top[0][0]:
+                heapq.heapreplace(top, result)
+
+    # Small first batch to set a k-th best score quickly, then doubling so heavy cases reach the process pool
+    position = 0
+    batch = max(k, 32)
+    while position < len(order) and bounds[order[position]] > kth_best():
+        if time.monotonic() >= deadline:
+            complete = False
+            break
+        # Bounds are sorted, so the candidates still able to beat the k-th best are a prefix of what's left
+        threshold = kth_best()
+        chunk = [(int(i), float(base[i]), candidates[i].types, candidates[i].moves)
+                 for i in order[position:position + batch] if bounds[i] > threshold]
+        position += len(chunk)
+
+        if len(chunk) >= SUGGEST_PARALLEL_THRESHOLD:
+            pieces = [chunk[i::SUGGEST_WORKERS] for i in range(SUGGEST_WORKERS)]
+            futures = [process_pool().submit(_score_chunk, profile.coverage, piece) for piece in pieces if piece]
+            done, not_done = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+            for future in done:
+                offer(future.result())
+            if not_done:
+                # Don't leave queued chunks to hold up the pool after we've answered
+                for future in not_done:
+                    future.cancel()
+                complete = False
+                break
+        else:
+            offer(_score_chunk(profile.coverage, chunk))
+        batch *= 2
+
+    suggestions = []
+    for score, index, chosen in sorted(top, reverse=True):
+        candidate = candidates[index]
+        move_types = [candidate.moves[i][1] for i in chosen]
+        covers = int(np.bitwise_or.reduce(SUPER_EFFECTIVE[move_types])) & ~profile.coverage if move_types else 0
+        multipliers = defensive_multipliers(np.array([candidate.types]))[0]
+        suggestions.append({
+            "pokemon": candidate.name,
+            "score": round(score, 3),
+            "moves": [candidate.moves[i][0] for i in chosen],
+            "adds_coverage": [TYPES[d] for d in range(TYPE_COUNT) if covers >> d & 1],
+            "resists_team_weaknesses": [TYPES[t] for t in range(TYPE_COUNT) if profile.weak[t] > 0 and multipliers[t] < 1],
+        })
+    return {"suggestions": suggestions, "evaluated": evaluated, "pruned": len(candidates) - evaluated, "complete": complete}
@@ -0,0 +1,188 @@
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from decouple import config
+from sqlalchemy import and_, delete, or_
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from upstream import UpstreamOverloaded
+from api_insertion import (client, content_hash, item_fields, learnset, move_fields, notify_reference_change,
+                           pokemon_fields, pokemon_sync_fields, stat_columns, utcnow)
+from models import Item, Links, Moves, Pokemon, UpstreamSync
+
+REFRESH_INTERVAL = config("REFRESH_INTERVAL", default=0, cast=int)  # Seconds between background runs, 0 disables the worker
+REFRESH_BUDGET = config("REFRESH_BUDGET", default=100, cast=int)  # Upstream requests allowed per run
+REFRESH_MAX_AGE = config("REFRESH_MAX_AGE", default=7 * 24 * 3600, cast=int)  # Rows checked more recently than this are skipped
+
+logger = logging.getLogger(__name__)
+
+ROW_MODELS = {"pokemon": Pokemon, "move": Moves, "item": Item}
+
+
+def seed_sync_rows(db: Session) -> int:
+    """Create bookkeeping rows for reference rows ingested before syncing existed. They sort first."""
+    added = 0
+    for kind, model in ROW_MODELS.items():
+        missing = db.exec(
+            select(model.name).outerjoin(UpstreamSync, and_(UpstreamSync.kind == kind, UpstreamSync.name == model.name))
+            .where(UpstreamSync.name.is_(None))
+        ).all()
+        for name in missing:
+            db.add(UpstreamSync(kind=kind, name=name, upstream_name=name.replace(' ', '-')))
+        added += len(missing)
+    if added:
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker seeded the same rows first
+            db.rollback()
+            return 0
+    return added
+
+
+def claim_stale_rows(db: Session, limit: int) -> list[tuple[UpstreamSync, datetime | None]]:
+    """Claim up to limit stale rows for this run, returning each with its previous checked_at.
+
+    Every uvicorn worker runs the refresh, so rows are locked with SKIP LOCKED and stamped as
+    checked before any request goes out; other workers' runs no longer see them as stale."""
+    # Never-checked rows first, then the longest unchecked
+    cutoff = utcnow() - timedelta(seconds=REFRESH_MAX_AGE)
+    rows = db.exec(
+        select(UpstreamSync)
+        .where(or_(UpstreamSync.checked_at.is_(None), UpstreamSync.checked_at < cutoff))
+        .order_by(UpstreamSync.checked_at.is_not(None), UpstreamSync.checked_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+    claimed = [(sync, sync.checked_at) for sync in rows]
+    now = utcnow()
+    for sync in rows:
+        sync.checked_at = now
+    db.commit()
+    return claimed
+
+
+def _apply_pokemon(db: Session, sync: UpstreamSync, data: dict):
+    pokemon = db.exec(select(Pokemon).where(Pokemon.name == sync.name)).first()
+    fields = pokemon_fields(data)
+    pokemon.pokemon_type = fields['pokemon_type']
+    pokemon.abilities = fields['abilities']
+    for key, value in stat_columns(data).items():
+        setattr(pokemon, key, value)
+
+    # Link newly learnable moves that are already known; unknown ones are picked up by normal ingestion
+    learnable = set(learnset(data))
+    linked = set(db.exec(select(Links.move_name).where(Links.pokemon_name == sync.name)).all())
+    known = set(db.exec(select(Moves.name).where(Moves.name.in_(learnable - linked))).all())
+    for move_name in known:
+        db.add(Links(pokemon_name=sync.name, move_name=move_name))
+    # Moves it no longer learns upstream are unlinked
+    if linked - learnable:
+        db.exec(delete(Links).where(Links.pokemon_name == sync.name, Links.move_name.in_(linked - learnable)))
+
+
+def _apply_move(db: Session, sync: UpstreamSync, data: dict):
+    move = db.get(Moves, sync.name)
+    for key, value in move_fields(data).items():
+        if key != 'name':
+            setattr(move, key, value)
+
+
+def _apply_item(db: Session, sync: UpstreamSync, data: dict):
+    item = db.exec(select(Item).where(Item.name == sync.name)).first()
+    item.description = item_fields(data)['description']
+
+
+def _fields_for(kind: str, data: dict) -> dict:
+    if kind == "pokemon":
+        return pokemon_sync_fields(data)
+    return move_fields(data) if kind == "move" else item_fields(data)
+
+
+APPLY = {"pokemon": _apply_pokemon, "move": _apply_move, "item": _apply_item}
+
+
+def run_refresh(db: Session, budget: int = REFRESH_BUDGET) -> dict:
+    """Re-check up to budget stale rows against upstream with conditional requests.
+
+    Rows are only rewritten when the hash of the fields we store has changed, so an
+    unchanged upstream costs one 304 and a timestamp update per row."""
+    seed_sync_rows(db)
+    stats = Counter()
+
+    claimed = claim_stale_rows(db, budget)
+    for position, (sync, _) in enumerate(claimed):
+        try:
+            # The sync row's validators, not the response cache's, so a cleared or per-host cache still gets 304s
+            response = client.get(sync.kind, sync.upstream_name, revalidate=True, etag=sync.etag,
+                                  last_modified=sync.last_modified)
+        except UpstreamOverloaded:
+            # Foreground traffic comes first; release the unchecked rows and pick them up next run
+            stats["deferred"] += 1
+            for unchecked, previous in claimed[position:]:
+                unchecked.checked_at = previous
+            db.commit()
+            break
+        stats["requests"] += 1
+        now = utcnow()
+
+        if response is None:
+            stats["failed"] += 1
+            sync.checked_at = now
+            db.commit()
+            continue
+
+        # Rows seeded without a hash are rewritten once, since we can't tell what they were built from
+        changed = not response.not_modified
+        if changed:
+            new_hash = content_hash(_fields_for(sync.kind, response.data))
+            changed = new_hash != sync.content_hash
+        if changed:
+            APPLY[sync.kind](db, sync, response.data)
+            sync.content_hash = new_hash
+            sync.fetched_at = now
+            stats["updated"] += 1
+        else:
+            stats["unchanged"] += 1
+
+        sync.etag = response.etag
+        sync.last_modified = response.last_modified
+        sync.checked_at = now
+        db.commit()
+
+        if changed:
+            notify_reference_change(sync.kind, sync.name)
+
+    logger.info(f"Refresh run finished: {dict(stats) or 'nothing stale'}")
+    return dict(stats)
+
+
+# ----- BACKGROUND WORKER -----
+
+def _worker(engine, stop: threading.Event):
+    while not stop.wait(REFRESH_INTERVAL):
+        try:
+            with Session(engine) as session:
+                run_refresh(session)
+        except Exception:
+            logger.exception("Refresh run failed")
+
+
+def start_worker(engine) -> threading.Event | None:
+    """Start the periodic refresh thread if REFRESH_INTERVAL is set. Set the returned event to stop it."""
+    if REFRESH_INTERVAL <= 0:
+        return None
+    stop = threading.Event()
+    threading.Thread(target=_worker, args=(engine, stop), name="upstream-refresh", daemon=True).start()
+    logger.info(f"Started upstream refresh worker, every {REFRESH_INTERVAL}s with a budget of {REFRESH_BUDGET} requests")
+    return stop
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    with Session(engine) as session:
+        run_refresh(session)
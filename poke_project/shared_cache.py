@@ -0,0 +1,290 @@
+import hashlib
+import json
+import logging
+import os
+import select
+import shutil
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from decouple import config
+
+CACHE_BACKEND = config("CACHE_BACKEND", default="memory")  # memory (per process) or shared (one copy per host)
+SHARED_CACHE_DIR = config("SHARED_CACHE_DIR", default="/dev/shm/pokeapi-cache")
+CACHE_TTL = config("CACHE_TTL", default=300, cast=int)  # Upper bound on staleness if an invalidation is missed
+CACHE_MAX_ENTRIES = config("CACHE_MAX_ENTRIES", default=20000, cast=int)
+CACHE_SWEEP_INTERVAL = config("CACHE_SWEEP_INTERVAL", default=60, cast=int)  # Seconds between sweeps of the shared cache directory
+CACHE_BROADCAST = config("CACHE_BROADCAST", default="none")  # none or postgres (LISTEN/NOTIFY across workers and hosts)
+
+CHANNEL = "pokeapi_invalidate"
+TEMP_GRACE = 60  # Temp files older than this were left by a writer that died mid-write
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """Encoded responses keyed by (namespace, key). Namespaces match the invalidation kinds."""
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: bytes):
+        ...
+
+    @abstractmethod
+    def invalidate(self, namespace: str, key: Optional[str] = None):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process LRU. Right for a single worker; with N workers it costs N copies."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: int = CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, tuple[float, bytes]] = OrderedDict()
+
+    def get(self, namespace, key):
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                return None
+            self._entries.move_to_end((namespace, key))
+            return entry[1]
+
+    def set(self, namespace, key, value):
+        with self._lock:
+            self._entries[(namespace, key)] = (time.monotonic(), value)
+            self._entries.move_to_end((namespace, key))
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, namespace, key=None):
+        with self._lock:
+            if key is not None:
+                self._entries.pop((namespace, key), None)
+            else:
+                for cache_key in [cache_key for cache_key in self._entries if cache_key[0] == namespace]:
+                    del self._entries[cache_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedFileBackend(CacheBackend):
+    """One file per entry under a tmpfs directory such as /dev/shm, shared by every worker on the host.
+
+    Pages live once in the kernel page cache however many workers read them, so memory per host stays
+    flat as workers are added. Writes go to a temp file and are renamed into place, so readers never see
+    a partial entry, and deleting a file invalidates it for every worker at once.
+
+    tmpfs is memory, so nothing may linger: expired entries are deleted when read, and every
+    sweep_interval a writer sweeps the directory for expired entries, leftover temp files and
+    namespaces moved aside, then evicts the oldest entries beyond max_entries."""
+
+    def __init__(self, root: str = SHARED_CACHE_DIR, ttl: int = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES,
+                 sweep_interval: int = CACHE_SWEEP_INTERVAL):
+        self.root = root
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self._sweep_lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, namespace, key):
+        return os.path.join(self.root, namespace, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, namespace, key):
+        path = self._path(namespace, key)
+        try:
+            with open(path, "rb") as f:
+                if time.time() - os.fstat(f.fileno()).st_mtime <= self.ttl:
+                    return f.read()
+        except FileNotFoundError:
+            return None
+        # If another worker refreshed it in the meantime this only costs a miss
+        self._remove(path)
+        return None
+
+    def set(self, namespace, key, value):
+        path = self._path(namespace, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp, "wb") as f:
+            f.write(value)
+        os.replace(temp, path)
+        if time.monotonic() >= self._next_sweep and self._sweep_lock.acquire(blocking=False):
+            self._next_sweep = time.monotonic() + self.sweep_interval
+            threading.Thread(target=self._sweep_in_background, name="cache-sweep", daemon=True).start()
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _sweep_in_background(self):
+        try:
+            self.sweep()
+        except Exception:
+            logger.exception(f"Failed to sweep the shared cache in {self.root}")
+        finally:
+            self._sweep_lock.release()
+
+    def sweep(self) -> int:
+        """Delete expired entries and debris, then the oldest entries past max_entries. Returns files removed."""
+        now = time.time()
+        removed = 0
+        entries = []
+        for name in os.listdir(self.root):
+            directory = os.path.join(self.root, name)
+            if name.endswith(".old"):
+                # A namespace invalidation that died before removing what it moved aside
+                shutil.rmtree(directory, ignore_errors=True)
+                continue
+            if not os.path.isdir(directory):
+                continue
+            for file_name in os.listdir(directory):
+                path = os.path.join(directory, file_name)
+                try:
+                    mtime = os.stat(path).st_mtime
+                except FileNotFoundError:
+                    continue
+                if file_name.endswith(".tmp"):
+                    if now - mtime > TEMP_GRACE:
+                        self._remove(path)
+                        removed += 1
+                elif now - mtime > self.ttl:
+                    self._remove(path)
+                    removed += 1
+                else:
+                    entries.append((mtime, path))
+
+        if len(entries) > self.max_entries:
+            entries.sort()
+            for _, path in entries[:len(entries) - self.max_entries]:
+                self._remove(path)
+                removed += 1
+        if removed:
+            logger.info(f"Swept {removed} files from the shared cache in {self.root}")
+        return removed
+
+    def invalidate(self, namespace, key=None):
+        if key is not None:
+            try:
+                os.remove(self._path(namespace, key))
+            except FileNotFoundError:
+                pass
+            return
+        # Move the namespace aside first so concurrent readers miss immediately
+        directory = os.path.join(self.root, namespace)
+        graveyard = f"{directory}.{uuid.uuid4().hex}.old"
+        try:
+            os.rename(directory, graveyard)
+        except FileNotFoundError:
+            return
+        shutil.rmtree(graveyard, ignore_errors=True)
+
+    def clear(self):
+        for namespace in os.listdir(self.root):
+            if os.path.isdir(os.path.join(self.root, namespace)) and not namespace.endswith(".old"):
+                self.invalidate(namespace)
+
+
+def make_backend(kind: str = CACHE_BACKEND) -> CacheBackend:
+    if kind == "shared":
+        return SharedFileBackend()
+    if kind == "memory":
+        return MemoryBackend()
+    raise ValueError(f"Unknown CACHE_BACKEND {kind!r}, expected memory or shared")
+
+
+class InvalidationBus:
+    """Fans a data change out to subscribers in this process and, with CACHE_BROADCAST=postgres, in every other worker.
+
+    Remote changes arrive over Postgres LISTEN/NOTIFY. Each process tags what it sends, so its own
+    notifications, which it has already handled locally, are ignored when they come back."""
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self.subscribers: list[Callable[[str, Optional[str]], None]] = []
+        self.engine = None
+
+    def subscribe(self, subscriber: Callable[[str, Optional[str]], None]):
+        self.subscribers.append(subscriber)
+
+    def _deliver(self, kind, name):
+        for subscriber in self.subscribers:
+            try:
+                subscriber(kind, name)
+            except Exception:
+                logger.exception(f"Invalidation subscriber failed for {kind} {name}")
+
+    def publish(self, kind: str, name: Optional[str] = None):
+        self._deliver(kind, name)
+        if self.engine is None:
+            return
+        payload = json.dumps({"origin": self.origin, "kind": kind, "name": name})
+        try:
+            with self.engine.connect() as connection:
+                connection.exec_driver_sql("SELECT pg_notify(%(channel)s, %(payload)s)", {"channel": CHANNEL, "payload": payload})
+                connection.commit()
+        except Exception:
+            # Other workers fall back on CACHE_TTL for this change
+            logger.exception(f"Failed to broadcast invalidation for {kind} {name}")
+
+    def start(self, engine) -> Optional[threading.Event]:
+        """Start listening for other workers' changes. Only Postgres has LISTEN/NOTIFY; elsewhere this is a no-op."""
+        if CACHE_BROADCAST != "postgres" or engine.dialect.name != "postgresql":
+            return None
+        self.engine = engine
+        stop = threading.Event()
+        threading.Thread(target=self._listen, args=(stop,), name="cache-invalidation", daemon=True).start()
+        logger.info(f"Listening for cache invalidations on {CHANNEL}")
+        return stop
+
+    def _listen(self, stop: threading.Event):
+        while not stop.is_set():
+            connection = None
+            try:
+                connection = self.engine.raw_connection()
+                driver = connection.driver_connection
+                driver.autocommit = True
+                driver.cursor().execute(f"LISTEN {CHANNEL}")
+                # Anything cached while we weren't listening may have missed a change
+                cache.clear()
+                while not stop.is_set():
+                    if select.select([driver], [], [], 5) == ([], [], []):
+                        continue
+                    driver.poll()
+                    while driver.notifies:
+                        message = json.loads(driver.notifies.pop(0).payload)
+                        if message["origin"] != self.origin:
+                            self._deliver(message["kind"], message["name"])
+            except Exception:
+                logger.exception("Cache invalidation listener lost its connection, reconnecting")
+                stop.wait(5)
+            finally:
+                # Never hand a LISTENing connection back to the pool
+                if connection is not None:
+                    connection.invalidate()
+
+cache = make_backend()
+bus = InvalidationBus()
+
+
+bus.subscribe(cache.invalidate)
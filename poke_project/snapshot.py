@@ -0,0 +1,84 @@
+import logging
+import os
+import sys
+
+from decouple import config
+from sqlalchemy import event, select
+from sqlalchemy.engine import Engine
+from sqlmodel import SQLModel, create_engine
+
+from models import Item, Links, Moves, Pokemon
+
+SNAPSHOT_MMAP_SIZE = config("SNAPSHOT_MMAP_SIZE", default=256 * 1024 * 1024, cast=int)
+COPY_BATCH = 5000
+
+# Copied in foreign key order
+REFERENCE_TABLES = [Pokemon.__table__, Moves.__table__, Links.__table__, Item.__table__]
+
+logger = logging.getLogger(__name__)
+
+
+def build_snapshot(source: Engine, path: str) -> dict:
+    """Compile the reference tables into a standalone SQLite file at path.
+
+    The file is written next to path and renamed into place, so workers serving the old
+    snapshot never see a half-written file. Team tables are created empty so team reads
+    answer normally instead of erroring."""
+    tmp_path = f"{path}.building"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    target = create_engine(f"sqlite:///{tmp_path}")
+    SQLModel.metadata.create_all(target)
+
+    counts = {}
+    with source.connect() as source_conn, target.begin() as target_conn:
+        for table in REFERENCE_TABLES:
+            counts[table.name] = 0
+            # Generated columns are recomputed by the target
+            columns = [column for column in table.columns if column.computed is None]
+            result = source_conn.execute(select(*columns).execution_options(stream_results=True, yield_per=COPY_BATCH))
+            for rows in result.mappings().partitions():
+                target_conn.execute(table.insert(), [dict(row) for row in rows])
+                counts[table.name] += len(rows)
+
+    with target.connect() as target_conn:
+        target_conn.exec_driver_sql("VACUUM")
+    target.dispose()
+
+    os.replace(tmp_path, path)
+    logger.info(f"Built snapshot {path}: {counts}")
+    return counts
+
+
+def snapshot_engine(path: str) -> Engine:
+    """Read-only engine over a snapshot file.
+
+    immutable=1 lets SQLite skip locking and change detection entirely, and mmap_size maps
+    the file into memory so every worker on the host shares the same page-cache pages."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Snapshot file {path} does not exist, build it with: python snapshot.py build {path}")
+
+    engine = create_engine(
+        f"sqlite:///file:{os.path.abspath(path)}?mode=ro&immutable=1&uri=true",
+        connect_args={"check_same_thread": False}
+    )
+
+    @event.listens_for(engine, "connect")
+    def configure_connection(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA mmap_size={SNAPSHOT_MMAP_SIZE}")
+        cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    return engine
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print("Usage: python snapshot.py build [path]")
+        sys.exit(1)
+
+    source_engine = create_engine(config("DATABASE_URL"))
+    build_snapshot(source_engine, sys.argv[2] if len(sys.argv) > 2 else "reference.snapshot")
@@ -0,0 +1,68 @@
+import logging
+from typing import Optional
+
+from decouple import config
+from sqlalchemy import bindparam, event, select
+from sqlalchemy.engine import Engine, Row
+from sqlmodel import Session
+
+from fieldsets import POKEMON_FIELDS, STATS_FIELDS
+from json_cache import MOVE_FIELDS
+from models import Item, Moves, Pokemon
+
+PREPARE_STATEMENTS = config("PREPARE_STATEMENTS", default=True, cast=bool)  # Server-side PREPARE on Postgres, turn off behind pgbouncer transaction pooling
+
+logger = logging.getLogger(__name__)
+
+
+class Lookup:
+    """A hot single-row lookup by name, built once instead of per request.
+
+    Reusing one select object means SQLAlchemy works out its cache key once and always hits the
+    compiled SQL cache. On Postgres every pooled connection also PREPAREs it, so lookups run as
+    EXECUTE and the server skips parsing and planning too. Connections where PREPARE failed, e.g.
+    before migrations created the table, and other databases run the select as usual."""
+
+    def __init__(self, name: str, columns: list, key_column):
+        self.name = name
+        self.statement = select(*columns).where(key_column == bindparam("name"))
+
+    def prepare_sql(self, dialect) -> str:
+        compiled = self.statement.compile(dialect=dialect)
+        # psycopg2 renders the parameter as %(name)s, PREPARE wants $1
+        return f"PREPARE {self.name} AS {str(compiled).replace('%(name)s', '$1')}"
+
+    def first(self, db: Session, name: str) -> Optional[Row]:
+        connection = db.connection()
+        if self.name in connection.info.get("prepared", ()):
+            return connection.exec_driver_sql(f"EXECUTE {self.name}(%(name)s)", {"name": name}).first()
+        return connection.execute(self.statement, {"name": name}).first()
+
+
+POKEMON_BY_NAME = Lookup("pokemon_by_name", [getattr(Pokemon, field) for field in POKEMON_FIELDS], Pokemon.name)
+STATS_BY_NAME = Lookup("stats_by_name", [getattr(Pokemon, field) for field in STATS_FIELDS], Pokemon.name)
+MOVE_BY_NAME = Lookup("move_by_name", [getattr(Moves, field) for field in MOVE_FIELDS], Moves.name)
+ITEM_BY_NAME = Lookup("item_by_name", [Item.id, Item.name, Item.description], Item.name)
+
+LOOKUPS = [POKEMON_BY_NAME, STATS_BY_NAME, MOVE_BY_NAME, ITEM_BY_NAME]
+
+
+def install(engine: Engine):
+    """PREPARE the lookups on every new connection of a Postgres engine."""
+    if not PREPARE_STATEMENTS or engine.dialect.name != "postgresql":
+        return
+
+    @event.listens_for(engine, "connect")
+    def prepare_lookups(dbapi_connection, connection_record):
+        prepared = set()
+        cursor = dbapi_connection.cursor()
+        for lookup in LOOKUPS:
+            try:
+                cursor.execute(lookup.prepare_sql(engine.dialect))
+                dbapi_connection.commit()
+                prepared.add(lookup.name)
+            except Exception as e:
+                dbapi_connection.rollback()
+                logger.warning(f"Could not prepare {lookup.name}, it will run unprepared on this connection: {e}")
+        cursor.close()
+        connection_record.info["prepared"] = prepared
@@ -0,0 +1,170 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlmodel import Session, select
+
+from models import Item, Pokemon, TeamMember, TeamMemberMove
+from shared_cache import CACHE_TTL, bus
+
+logger = logging.getLogger(__name__)
+
+# 32 bit ids halve the memory of every posting list
+ID_TYPE = np.uint32
+EMPTY = np.empty(0, dtype=ID_TYPE)
+
+
+class Posting:
+    """Sorted team ids for one component. Writes are buffered and merged into the array on the next read."""
+
+    __slots__ = ("ids", "added", "removed")
+
+    def __init__(self, ids: np.ndarray = EMPTY):
+        self.ids = ids
+        self.added = set()
+        self.removed = set()
+
+    def add(self, team_id: int):
+        self.removed.discard(team_id)
+        self.added.add(team_id)
+
+    def remove(self, team_id: int):
+        self.added.discard(team_id)
+        if self.contains(team_id):
+            self.removed.add(team_id)
+
+    def contains(self, team_id: int) -> bool:
+        position = np.searchsorted(self.ids, team_id)
+        return position < len(self.ids) and self.ids[position] == team_id
+
+    def compact(self) -> np.ndarray:
+        if self.removed:
+            self.ids = self.ids[~np.isin(self.ids, np.fromiter(self.removed, dtype=ID_TYPE))]
+            self.removed.clear()
+        if self.added:
+            self.ids = np.union1d(self.ids, np.fromiter(self.added, dtype=ID_TYPE))
+            self.added.clear()
+        return self.ids
+
+
+def member_keys(species: str, item: Optional[str], ability: Optional[str], moves: Iterable[str]) -> set[tuple]:
+    """Index keys for one team member. Pairs with the species let a search require the same member."""
+    species = species.lower()
+    components = [("move", move.lower()) for move in moves]
+    if item:
+        components.append(("item", item.lower()))
+    if ability:
+        components.append(("ability", ability.lower()))
+    keys = {("species", species), *components}
+    keys.update((field, value, species) for field, value in components)
+    return keys
+
+
+class TeamIndex:
+    """Inverted index from team components (species, moves, items, abilities) to team ids.
+
+    Built on the first search and kept current from team write notifications, which only mark a team
+    dirty; dirty teams are re-read before the next search. Notifications only reach other workers with
+    CACHE_BROADCAST=postgres, so the index is also rebuilt once it is older than ttl. Searches intersect
+    postings smallest first."""
+
+    def __init__(self, ttl: int = CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # One build or dirty reload at a time
+        self.postings: dict[tuple, Posting] = {}
+        self.built = False
+        self.built_at = 0.0
+        self._building = False
+        self._dirty: set[int] = set()
+
+    def invalidate(self, kind: str, key: Optional[str] = None):
+        if kind != "team_composition":
+            return
+        with self._lock:
+            if key is None:
+                self.built = False
+            elif self.built or self._building:
+                self._dirty.add(int(key))
+
+    def _compositions(self, db: Session, team_ids: Optional[list[int]] = None) -> dict[int, set[tuple]]:
+        members = (select(TeamMember.id, TeamMember.team_id, Pokemon.name, Item.name, TeamMember.ability)
+                   .join(Pokemon, Pokemon.natdex_id == TeamMember.pokemon_id)
+                   .outerjoin(Item, Item.id == TeamMember.item_id))
+        moves = select(TeamMemberMove.team_member_id, TeamMemberMove.move_name)
+        if team_ids is not None:
+            members = members.where(TeamMember.team_id.in_(team_ids))
+            moves = moves.join(TeamMember, TeamMember.id == TeamMemberMove.team_member_id).where(TeamMember.team_id.in_(team_ids))
+
+        member_moves = defaultdict(list)
+        for member_id, move_name in db.exec(moves.execution_options(yield_per=10000)):
+            member_moves[member_id].append(move_name)
+
+        compositions = defaultdict(set)
+        for member_id, team_id, species, item, ability in db.exec(members.execution_options(yield_per=10000)):
+            compositions[team_id] |= member_keys(species, item, ability, member_moves.pop(member_id, ()))
+        return compositions
+
+    def build(self, db: Session):
+        # Writes made while building are recorded as dirty and applied on top
+        with self._lock:
+            self._dirty.clear()
+            self._building = True
+        lists = defaultdict(list)
+        for team_id, keys in self._compositions(db).items():
+            for key in keys:
+                lists[key].append(team_id)
+        postings = {key: Posting(np.unique(np.array(ids, dtype=ID_TYPE))) for key, ids in lists.items()}
+        with self._lock:
+            self.postings = postings
+            self.built = True
+            self.built_at = time.monotonic()
+            self._building = False
+        logger.info(f"Built team index: {len(postings)} components")
+
+    def _refresh(self, db: Session):
+        with self._refresh_lock:
+            if not self.built or time.monotonic() - self.built_at > self.ttl:
+                self.build(db)
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+            if not dirty:
+                return
+            compositions = self._compositions(db, sorted(dirty))
+            with self._lock:
+                for posting in self.postings.values():
+                    for team_id in dirty:
+                        posting.remove(team_id)
+                for team_id, keys in compositions.items():
+                    for key in keys:
+                        self.postings.setdefault(key, Posting()).add(team_id)
+
+    def search(self, db: Session, species: list[str], moves: list[str], items: list[str], abilities: list[str]) -> np.ndarray:
+        """Sorted ids of teams holding every component. With a single species the other components must be on that Pokémon."""
+        self._refresh(db)
+        owner = (species[0].lower(),) if len(species) == 1 else ()
+        keys = [("species", name.lower()) for name in species]
+        for field, values in (("move", moves), ("item", items), ("ability", abilities)):
+            keys.extend((field, value.lower(), *owner) for value in values)
+        if not keys:
+            return EMPTY
+
+        with self._lock:
+            postings = [self.postings.get(key) for key in keys]
+            if any(posting is None for posting in postings):
+                return EMPTY
+            arrays = sorted((posting.compact() for posting in postings), key=len)
+
+        result = arrays[0]
+        for ids in arrays[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, ids, assume_unique=True)
+        return result
+
+
+team_index = TeamIndex()
+bus.subscribe(team_index.invalidate)
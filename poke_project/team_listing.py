@@ -0,0 +1,89 @@
+import json
+from typing import Iterator, Optional
+
+from sqlalchemy import func, or_, text
+from sqlmodel import Session, select
+
+from models import Team
+
+YIELD_PER = 1000  # Rows fetched per round trip when streaming
+
+# Names aren't unique, so name order breaks ties on id to keep the cursor stable
+ORDERINGS = {
+    "id": [Team.id],
+    "name": [Team.name, Team.id],
+}
+
+CURSOR_SEPARATOR = "|"
+
+
+def parse_cursor(order: str, after: str) -> tuple:
+    """Name cursors are "name|id"; the name itself may contain the separator, so split from the right."""
+    if order == "id":
+        try:
+            return (int(after),)
+        except ValueError:
+            raise ValueError("Cursor for id order must be a team id")
+    name, separator, team_id = after.rpartition(CURSOR_SEPARATOR)
+    if not separator or not team_id.isdigit():
+        raise ValueError(f"Cursor for name order must be name{CURSOR_SEPARATOR}id")
+    return (name, int(team_id))
+
+
+def cursor_for(order: str, row: dict) -> str:
+    if order == "id":
+        return str(row["team_id"])
+    return f"{row['team_name']}{CURSOR_SEPARATOR}{row['team_id']}"
+
+
+def filtered(query, prefix: Optional[str]):
+    if prefix:
+        # The lower bound lets the Team.name index start the range scan; startswith keeps it exact
+        query = query.where(Team.name >= prefix, Team.name.startswith(prefix, autoescape=True))
+    return query
+
+
+def listing_query(order: str, after: Optional[str] = None, prefix: Optional[str] = None):
+    query = filtered(select(Team.id, Team.name), prefix)
+    if after is not None:
+        values = parse_cursor(order, after)
+        if order == "id":
+            query = query.where(Team.id > values[0])
+        else:
+            query = query.where(or_(Team.name > values[0], (Team.name == values[0]) & (Team.id > values[1])))
+    return query.order_by(*ORDERINGS[order])
+
+
+def _row(row) -> dict:
+    return {"team_id": row[0], "team_name": row[1]}
+
+
+def page(db: Session, order: str, after: Optional[str], prefix: Optional[str], limit: int) -> tuple[list[dict], Optional[str]]:
+    """One page and the cursor for the next, or None when this was the last page."""
+    rows = [_row(row) for row in db.exec(listing_query(order, after, prefix).limit(limit + 1)).all()]
+    next_cursor = cursor_for(order, rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def iter_teams(db: Session, order: str, after: Optional[str], prefix: Optional[str]) -> Iterator[dict]:
+    """Every matching team in order through a server-side cursor, for exports."""
+    result = db.exec(listing_query(order, after, prefix).execution_options(stream_results=True, yield_per=YIELD_PER))
+    for row in result:
+        yield _row(row)
+
+
+def estimate_count(db: Session, prefix: Optional[str] = None) -> int:
+    """Planner estimate on Postgres, which costs nothing however big the table is. Exact count elsewhere."""
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        return db.exec(filtered(select(func.count(Team.id)), prefix)).one()
+
+    if not prefix:
+        estimate = db.execute(text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'teams'")).scalar()
+        if estimate is not None and estimate >= 0:
+            return estimate
+    compiled = filtered(select(Team.id), prefix).compile(bind)
+    plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import Counter
+
+from decouple import config
+from sqlmodel import Session, select, func
+
+from models import Pokemon, Moves, Item, Links, UpstreamSync
+
+MAX_TEAM_SIZE = 6
+MAX_MOVES = 4
+REFRESH_INTERVAL = config("VALIDATOR_REFRESH_INTERVAL", default=30.0, cast=float)
+
+
+class TeamValidationError(Exception):
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+
+class TeamValidator:
+    """Team legality checks against an in-memory copy of the reference tables.
+
+    Everything a check needs (species, abilities, learnsets, moves, items) is compiled
+    into dicts and frozensets once, so validating a team never touches the database.
+    The compiled data is rebuilt when ingestion reports new rows, or when the database
+    fingerprint changes (e.g. rows written or refreshed by another worker).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.species = {}  # name -> (natdex_id, abilities, learnset)
+        self.moves = frozenset()
+        self.items = {}  # name -> id
+        self.fingerprint = None
+        self.checked_at = 0.0
+        self.stale = True
+
+    def invalidate(self, *args):
+        self.stale = True
+
+    def _fingerprint(self, db: Session) -> tuple:
+        # Counts catch inserts and deletes. Ingestion and refresh stamp fetched_at whenever they write
+        # a row's content, so its latest value catches updates that leave every count the same.
+        counts = tuple(db.exec(select(func.count()).select_from(table)).one() for table in (Pokemon, Moves, Links, Item))
+        return counts + (db.exec(select(func.max(UpstreamSync.fetched_at))).one(),)
+
+    def compile(self, db: Session):
+        learnsets = {}
+        for pokemon_name, move_name in db.exec(select(Links.pokemon_name, Links.move_name)).all():
+            learnsets.setdefault(pokemon_name, set()).add(move_name)
+
+        species = {
+            name: (natdex_id, frozenset(abilities.split('/')) if abilities else frozenset(), frozenset(learnsets.get(name, ())))
+            for natdex_id, name, abilities in db.exec(select(Pokemon.natdex_id, Pokemon.name, Pokemon.abilities)).all()
+        }
+        moves = frozenset(db.exec(select(Moves.name)).all())
+        items = {name: item_id for item_id, name in db.exec(select(Item.id, Item.name)).all()}
+
+        with self._lock:
+            self.species, self.moves, self.items = species, moves, items
+            self.fingerprint = self._fingerprint(db)
+            self.checked_at = time.monotonic()
+            self.stale = False
+
+    def refresh(self, db: Session, force: bool = False) -> bool:
+        """Recompile if the reference data changed. Returns True if a rebuild happened."""
+        if self.stale:
+            self.compile(db)
+            return True
+        if not force and time.monotonic() - self.checked_at < REFRESH_INTERVAL:
+            return False
+        fingerprint = self._fingerprint(db)
+        self.checked_at = time.monotonic()
+        if fingerprint != self.fingerprint:
+            self.compile(db)
+            return True
+        return False
+
+    def check(self, members: list[tuple], species_clause: bool = False, item_clause: bool = False) -> list[str]:
+        """Return every legality problem with a team of (pokemon_name, ability, item_name, moves) tuples."""
+        species, known_moves, items = self.species, self.moves, self.items
+        errors = []
+
+        if not members:
+            errors.append("A team needs at least one Pokémon")
+        if len(members) > MAX_TEAM_SIZE:
+            errors.append(f"A team can have at most {MAX_TEAM_SIZE} Pokémon")
+
+        for pokemon_name, ability, item_name, moves in members:
+            entry = species.get(pokemon_name)
+            if entry is None:
+                errors.append(f"Pokémon {pokemon_name} not found")
+                continue
+            _, abilities, learnset = entry
+
+            if ability and ability not in abilities:
+                errors.append(f"{pokemon_name} cannot have the ability {ability}")
+            if len(moves) > MAX_MOVES:
+                errors.append(f"{pokemon_name} has more than {MAX_MOVES} moves")
+            if len(set(moves)) != len(moves):
+                errors.append(f"{pokemon_name} has a duplicate move")
+            for move_name in moves:
+                if move_name not in learnset:
+                    errors.append(f"{pokemon_name} cannot learn {move_name}")
+                elif move_name not in known_moves:
+                    errors.append(f"{move_name} not found")
+            if item_name and item_name not in items:
+                errors.append(f"Item {item_name} not found")
+
+        if species_clause:
+            for name, count in Counter(member[0] for member in members).items():
+                if count > 1:
+                    errors.append(f"Species clause: {name} appears {count} times")
+        if item_clause:
+            for name, count in Counter(member[2] for member in members if member[2]).items():
+                if count > 1:
+                    errors.append(f"Item clause: {name} is held {count} times")
+
+        return errors
+
+    def resolve(self, members: list[tuple]) -> list[tuple]:
+        """Validate members and map them to (pokemon_id, ability, item_id, moves) for writing.
+
+        Raises TeamValidationError with the first problem found."""
+        errors = self.check(members)
+        if errors:
+            raise TeamValidationError(errors[0])
+        return [(self.species[name][0], ability, self.items[item] if item else None, list(moves))
+                for name, ability, item, moves in members]
+
+
+validator = TeamValidator()
@@ -0,0 +1,118 @@
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import insert
+from sqlmodel import Session, delete
+
+from models import Team, TeamMember, TeamMemberMove
+from team_validator import validator, TeamValidationError
+from shared_cache import bus
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ResolvedMember:
+    pokemon_id: int
+    ability: Optional[str]
+    item_id: Optional[int]
+    moves: list[str] = field(default_factory=list)
+
+
+# ----- VALIDATION -----
+
+def resolve_members(db: Session, pokemon_data: list[tuple]) -> list[ResolvedMember]:
+    """Validate every requested member before anything is written.
+
+    pokemon_data holds (pokemon_name, ability, item_name, moves) tuples. Checks run against
+    the compiled in-memory validator, so the database is only hit to refresh it."""
+    validator.refresh(db)
+    try:
+        resolved = validator.resolve(pokemon_data)
+    except TeamValidationError:
+        # A name may have been ingested since the last compile, possibly by another worker
+        if not validator.refresh(db, force=True):
+            raise
+        resolved = validator.resolve(pokemon_data)
+    return [ResolvedMember(*member) for member in resolved]
+
+
+# ----- WRITES -----
+
+def _insert_members(db: Session, team_id: int, members: list[ResolvedMember]):
+    if not members:
+        return
+    # RETURNING hands back the new ids in parameter order, so moves can be attached without a re-read
+    member_ids = db.scalars(
+        insert(TeamMember).returning(TeamMember.id, sort_by_parameter_order=True),
+        [{"team_id": team_id, "pokemon_id": m.pokemon_id, "item_id": m.item_id, "ability": m.ability} for m in members]
+    ).all()
+    move_rows = [{"team_member_id": member_id, "move_name": move_name}
+                 for member_id, member in zip(member_ids, members) for move_name in member.moves]
+    if move_rows:
+        db.execute(insert(TeamMemberMove), move_rows)
+
+
+def create_team(db: Session, team_name: str, members: list[ResolvedMember]) -> int:
+    """Insert a team and all of its members and moves in one transaction. Returns the team id."""
+    team_id = db.scalars(insert(Team).returning(Team.id), [{"name": team_name}]).one()
+    _insert_members(db, team_id, members)
+    db.commit()
+    bus.publish('team', team_name)
+    bus.publish('team_composition', str(team_id))
+    return team_id
+
+
+def apply_team_diff(db: Session, team: Team, members: list[ResolvedMember]) -> dict:
+    """Bring a stored team in line with members, touching only rows that actually change.
+
+    Members are matched by position. Unchanged members cost no writes, changed moves are
+    diffed rather than rewritten, and everything is committed once at the end."""
+    existing = sorted(team.members, key=lambda member: member.id)
+    stats = Counter()
+
+    for stored, wanted in zip(existing, members):
+        if (stored.pokemon_id, stored.item_id, stored.ability) != (wanted.pokemon_id, wanted.item_id, wanted.ability):
+            stored.pokemon_id = wanted.pokemon_id
+            stored.item_id = wanted.item_id
+            stored.ability = wanted.ability
+            stats["members_updated"] += 1
+
+        stored_moves = Counter(move.move_name for move in stored.team_member_moves)
+        wanted_moves = Counter(wanted.moves)
+        if stored_moves == wanted_moves:
+            continue
+
+        surplus = stored_moves - wanted_moves
+        stale_ids = []
+        for move in stored.team_member_moves:
+            if surplus[move.move_name]:
+                surplus[move.move_name] -= 1
+                stale_ids.append(move.id)
+        if stale_ids:
+            db.exec(delete(TeamMemberMove).where(TeamMemberMove.id.in_(stale_ids)))
+            stats["moves_deleted"] += len(stale_ids)
+
+        new_moves = list((wanted_moves - stored_moves).elements())
+        if new_moves:
+            db.execute(insert(TeamMemberMove), [{"team_member_id": stored.id, "move_name": name} for name in new_moves])
+            stats["moves_inserted"] += len(new_moves)
+
+    added = members[len(existing):]
+    if added:
+        _insert_members(db, team.id, added)
+        stats["members_inserted"] += len(added)
+
+    removed_ids = [member.id for member in existing[len(members):]]
+    if removed_ids:
+        db.exec(delete(TeamMemberMove).where(TeamMemberMove.team_member_id.in_(removed_ids)))
+        db.exec(delete(TeamMember).where(TeamMember.id.in_(removed_ids)))
+        stats["members_deleted"] += len(removed_ids)
+
+    db.commit()
+    bus.publish('team', team.name)
+    bus.publish('team_composition', str(team.id))
+    logger.info(f"Updated team {team.name}: {dict(stats) or 'no changes'}")
+    return dict(stats)
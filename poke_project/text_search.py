@@ -0,0 +1,163 @@
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Optional
+
+from sqlalchemy import inspect, text
+from sqlmodel import Session, select
+
+from models import Moves, Item
+from shared_cache import CACHE_TTL
+
+TEXT_CONFIG = "english"
+STOP_WORDS = {"a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "if", "in", "is", "it", "its",
+              "of", "on", "or", "that", "the", "this", "to", "which", "with", "what", "move", "moves"}
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def stem(word: str) -> str:
+    """Light suffix stripping, enough that "lowers", "lowered" and "lowering" all match "lower"."""
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(value: str) -> list[str]:
+    return [stem(word) for word in _WORD.findall(value.lower().replace("'s", "")) if word not in STOP_WORDS]
+
+
+class InvertedIndex:
+    """In-process BM25 index over move and item names and descriptions.
+
+    Used when the database has no tsvector support (SQLite, snapshot mode). Rebuilt lazily
+    after ingestion reports new rows, or once older than ttl for rows ingested by other workers."""
+
+    def __init__(self, ttl: int = CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.stale = True
+        self.built_at = 0.0
+        self.documents = []  # (kind, name, description, move_type, category, length)
+        self.postings = defaultdict(list)  # term -> [(doc index, term frequency)]
+        self.average_length = 0.0
+
+    def invalidate(self, *args):
+        self.stale = True
+
+    def build(self, db: Session):
+        documents = []
+        for move in db.exec(select(Moves.name, Moves.description, Moves.move_type, Moves.category)).all():
+            documents.append(("move", move.name, move.description, move.move_type, move.category))
+        for item in db.exec(select(Item.name, Item.description)).all():
+            documents.append(("item", item.name, item.description, None, None))
+
+        postings = defaultdict(list)
+        indexed = []
+        for doc_id, (kind, name, description, move_type, category) in enumerate(documents):
+            terms = Counter(tokenize(f"{name} {description or ''}"))
+            for term, frequency in terms.items():
+                postings[term].append((doc_id, frequency))
+            indexed.append((kind, name, description, move_type, category, sum(terms.values())))
+
+        with self._lock:
+            self.documents = indexed
+            self.postings = postings
+            self.average_length = sum(doc[5] for doc in indexed) / len(indexed) if indexed else 0.0
+            self.stale = False
+            self.built_at = time.monotonic()
+
+    def search(self, db: Session, query: str, kinds: set, move_type: Optional[str], category: Optional[str], limit: int) -> list[dict]:
+        if self.stale or time.monotonic() - self.built_at > self.ttl:
+            self.build(db)
+
+        with self._lock:
+            documents, postings, average_length = self.documents, self.postings, self.average_length
+
+        terms = set(tokenize(query))
+        scores = defaultdict(float)
+        matched = defaultdict(int)
+        for term in terms:
+            term_postings = postings.get(term, ())
+            if not term_postings:
+                continue
+            idf = math.log(1 + (len(documents) - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            for doc_id, frequency in term_postings:
+                length = documents[doc_id][5]
+                scores[doc_id] += idf * frequency * (BM25_K1 + 1) / (
+                    frequency + BM25_K1 * (1 - BM25_B + BM25_B * length / (average_length or 1)))
+                matched[doc_id] += 1
+
+        results = []
+        for doc_id, score in scores.items():
+            kind, name, description, doc_move_type, doc_category, _ = documents[doc_id]
+            # Every query term has to match, like a websearch_to_tsquery AND
+            if matched[doc_id] < len(terms) or kind not in kinds:
+                continue
+            if (move_type and doc_move_type != move_type) or (category and doc_category != category):
+                continue
+            results.append({"kind": kind, "name": name, "description": description, "score": round(score, 4)})
+
+        results.sort(key=lambda result: (-result["score"], result["name"]))
+        return results[:limit]
+
+
+text_index = InvertedIndex()
+
+
+def search_postgres(db: Session, query: str, kinds: set, move_type: Optional[str], category: Optional[str], limit: int) -> list[dict]:
+    """Ranked search against the GIN-indexed search_vector columns."""
+    params = {"q": query, "limit": limit}
+    selects = []
+    if "move" in kinds:
+        move_filters = ""
+        if move_type:
+            move_filters += " AND move_type = :move_type"
+            params["move_type"] = move_type
+        if category:
+            move_filters += " AND category = :category"
+            params["category"] = category
+        selects.append(
+            "SELECT 'move' AS kind, name, description, ts_rank(search_vector, query) AS score "
+            f"FROM moves, websearch_to_tsquery('{TEXT_CONFIG}', :q) query WHERE search_vector @@ query{move_filters}"
+        )
+    if "item" in kinds:
+        selects.append(
+            "SELECT 'item' AS kind, name, description, ts_rank(search_vector, query) AS score "
+            f"FROM items, websearch_to_tsquery('{TEXT_CONFIG}', :q) query WHERE search_vector @@ query"
+        )
+
+    sql = " UNION ALL ".join(selects) + " ORDER BY score DESC, name LIMIT :limit"
+    rows = db.execute(text(sql), params).mappings().all()
+    return [{"kind": row["kind"], "name": row["name"], "description": row["description"], "score": round(row["score"], 4)}
+            for row in rows]
+
+
+_tsvector_support = {}
+
+
+def has_tsvector(db: Session) -> bool:
+    """True when the bound database has the search_vector columns added by the full text migration."""
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        return False
+    if bind.url not in _tsvector_support:
+        columns = {column["name"] for column in inspect(bind).get_columns("moves")}
+        _tsvector_support[bind.url] = "search_vector" in columns
+    return _tsvector_support[bind.url]
+
+
+def search(db: Session, query: str, kinds: set, move_type: Optional[str] = None, category: Optional[str] = None, limit: int = 20) -> list[dict]:
+    # Item rows have no type or category, so move filters narrow the search to moves
+    if move_type or category:
+        kinds = kinds & {"move"}
+    if not kinds:
+        return []
+    if has_tsvector(db):
+        return search_postgres(db, query, kinds, move_type, category, limit)
+    return text_index.search(db, query, kinds, move_type, category, limit)
@@ -0,0 +1,377 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+import requests
+from decouple import config
+from requests.adapters import HTTPAdapter
+
+# ----- SETTINGS -----
+
+BASE_URL = config("POKEAPI_URL", default="https://pokeapi.co/api/v2/")
+CONNECT_TIMEOUT = config("UPSTREAM_CONNECT_TIMEOUT", default=3.05, cast=float)
+READ_TIMEOUT = config("UPSTREAM_READ_TIMEOUT", default=10.0, cast=float)
+MAX_RETRIES = config("UPSTREAM_MAX_RETRIES", default=3, cast=int)
+BACKOFF_BASE = config("UPSTREAM_BACKOFF_BASE", default=0.5, cast=float)
+BACKOFF_MAX = config("UPSTREAM_BACKOFF_MAX", default=8.0, cast=float)
+POOL_SIZE = config("UPSTREAM_POOL_SIZE", default=20, cast=int)
+CACHE_DIR = config("UPSTREAM_CACHE_DIR", default=".upstream_cache")
+CACHE_TTL = config("UPSTREAM_CACHE_TTL", default=3600, cast=int)  # Seconds a cached body is served without revalidating
+OFFLINE = config("UPSTREAM_OFFLINE", default=False, cast=bool)  # Serve only from the local cache, never touch the network
+
+MAX_CONCURRENCY = config("UPSTREAM_MAX_CONCURRENCY", default=10, cast=int)  # Outbound requests in flight at once, across all threads
+RATE_LIMIT = config("UPSTREAM_RATE_LIMIT", default=20.0, cast=float)  # Requests per second, 0 turns the token bucket off
+BURST = config("UPSTREAM_BURST", default=20, cast=int)
+MAX_QUEUE = config("UPSTREAM_MAX_QUEUE", default=50, cast=int)  # Requests allowed to wait for a slot before new ones are rejected
+MAX_WAIT = config("UPSTREAM_MAX_WAIT", default=5.0, cast=float)  # Seconds a request waits for a slot before giving up
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class UpstreamResponse:
+    url: str
+    data: Optional[dict]  # None for a 304 to validators the cache has no body for
+    content_hash: Optional[str]
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: float = 0.0
+    from_cache: bool = False
+    not_modified: bool = False  # Upstream answered 304 to the caller's own validators
+
+
+# ----- ADMISSION CONTROL -----
+
+class UpstreamOverloaded(Exception):
+    """Raised instead of queueing when outbound capacity is exhausted."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Upstream capacity exhausted ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Global gate for outbound requests: a concurrency cap, a token bucket rate limit
+    and a bounded wait queue. Callers past the queue bound, or that wait longer than
+    max_wait, are rejected straight away rather than piling up behind upstream."""
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, rate: float = RATE_LIMIT, burst: int = BURST,
+                 max_queue: int = MAX_QUEUE, max_wait: float = MAX_WAIT):
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "timeout": 0}
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _refill(self, now: float):
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _ready(self) -> bool:
+        return self.in_flight < self.max_concurrency and (self.rate <= 0 or self._tokens >= 1)
+
+    def _retry_after(self) -> int:
+        if self.rate > 0:
+            return max(1, math.ceil((self.waiting + 1) / self.rate))
+        return max(1, math.ceil(self.max_wait))
+
+    def _reject(self, reason: str):
+        self.rejected[reason] += 1
+        raise UpstreamOverloaded(reason, self._retry_after())
+
+    @contextmanager
+    def slot(self):
+        started = time.monotonic()
+        deadline = started + self.max_wait
+        with self._cond:
+            self._refill(started)
+            if not self._ready():
+                if self.waiting >= self.max_queue:
+                    self._reject("queue_full")
+
+                self.waiting += 1
+                try:
+                    while True:
+                        now = time.monotonic()
+                        self._refill(now)
+                        if self._ready():
+                            break
+                        if now >= deadline:
+                            self._reject("timeout")
+                        timeout = deadline - now
+                        if self.in_flight < self.max_concurrency:
+                            # Only short on tokens, so wake up when the next one is due
+                            timeout = min(timeout, (1 - self._tokens) / self.rate)
+                        self._cond.wait(timeout)
+                finally:
+                    self.waiting -= 1
+
+            if self.rate > 0:
+                self._tokens -= 1
+            self.in_flight += 1
+            self.admitted += 1
+            waited = time.monotonic() - started
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify()
+
+    def metrics(self) -> dict:
+        with self._cond:
+            return {
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "admitted_total": self.admitted,
+                "rejected_queue_full_total": self.rejected["queue_full"],
+                "rejected_timeout_total": self.rejected["timeout"],
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+
+
+# ----- ON-DISK CACHE -----
+
+class ResponseCache:
+    """Content-addressed store of upstream JSON bodies.
+
+    Bodies live under objects/ keyed by the sha256 of their bytes, so identical
+    payloads are stored once. index/ maps each URL to its current body hash and
+    the validators needed for conditional requests.
+    """
+
+    def __init__(self, root: str = CACHE_DIR):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.index_dir = os.path.join(root, "index")
+
+    def _index_path(self, url: str) -> str:
+        return os.path.join(self.index_dir, hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def _object_path(self, content_hash: str) -> str:
+        return os.path.join(self.objects_dir, content_hash[:2], content_hash + ".json")
+
+    def _write_atomic(self, path: str, payload: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(payload)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get_entry(self, url: str) -> Optional[dict]:
+        try:
+            with open(self._index_path(url), "rb") as index_file:
+                return json.load(index_file)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, entry: dict) -> Optional[UpstreamResponse]:
+        try:
+            with open(self._object_path(entry["hash"]), "rb") as object_file:
+                data = json.loads(object_file.read())
+        except (OSError, ValueError):
+            return None
+        return UpstreamResponse(
+            url=entry["url"],
+            data=data,
+            content_hash=entry["hash"],
+            etag=entry.get("etag"),
+            last_modified=entry.get("last_modified"),
+            fetched_at=entry.get("fetched_at", 0.0),
+            from_cache=True
+        )
+
+    def store(self, url: str, body: bytes, etag: Optional[str], last_modified: Optional[str]) -> dict:
+        content_hash = hashlib.sha256(body).hexdigest()
+        object_path = self._object_path(content_hash)
+        if not os.path.exists(object_path):
+            self._write_atomic(object_path, body)
+        entry = {
+            "url": url,
+            "hash": content_hash,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time()
+        }
+        self._write_atomic(self._index_path(url), json.dumps(entry).encode())
+        return entry
+
+    def touch(self, url: str, entry: dict) -> dict:
+        entry = dict(entry, fetched_at=time.time())
+        self._write_atomic(self._index_path(url), json.dumps(entry).encode())
+        return entry
+
+    def entries(self):
+        if not os.path.isdir(self.index_dir):
+            return
+        for file_name in sorted(os.listdir(self.index_dir)):
+            if not file_name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.index_dir, file_name), "rb") as index_file:
+                    entry = json.load(index_file)
+            except (OSError, ValueError):
+                # One truncated or unreadable index file shouldn't stop a crawl from replaying the rest
+                logger.warning(f"Skipping unreadable cache index file {file_name}")
+                continue
+            if isinstance(entry, dict) and "url" in entry:
+                yield entry
+
+
+# ----- CLIENT -----
+
+class UpstreamClient:
+    """Shared PokeAPI client with pooled keep-alive connections, timeouts,
+    jittered retries and a revalidating on-disk cache."""
+
+    def __init__(self, base_url: str = BASE_URL, cache: Optional[ResponseCache] = None, offline: bool = OFFLINE,
+                 admission: Optional[AdmissionController] = None):
+        self.base_url = base_url.rstrip("/")
+        self.cache = cache if cache is not None else ResponseCache()
+        self.offline = offline
+        self.admission = admission if admission is not None else AdmissionController()
+        self.timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url_for(self, endpoint: str, name) -> str:
+        return f"{self.base_url}/{endpoint.strip('/')}/{name}"
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_MAX)
+        # Full jitter keeps a burst of retrying workers from hitting upstream in lockstep
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+    def _request(self, url: str, headers: dict) -> requests.Response:
+        attempt = 0
+        while True:
+            try:
+                with self.admission.slot():
+                    response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= MAX_RETRIES:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"Request to {url} failed ({e.__class__.__name__}), retrying in {delay:.2f}s")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= MAX_RETRIES:
+                    return response
+                delay = self._backoff(attempt, response.headers.get("Retry-After"))
+                logger.warning(f"Request to {url} returned {response.status_code}, retrying in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, endpoint: str, name, revalidate: bool = False, etag: Optional[str] = None,
+            last_modified: Optional[str] = None) -> Optional[UpstreamResponse]:
+        """Fetch through the cache. etag/last_modified replace the cached validators for callers that keep
+        their own, such as the refresh worker; a 304 to them comes back with not_modified set, and with
+        data only if the cache holds that same version."""
+        url = self.url_for(endpoint, name)
+        entry = self.cache.get_entry(url)
+        cached = self.cache.load(entry) if entry else None
+
+        if self.offline:
+            if cached is None:
+                logger.error(f"Offline mode: no cached response for {url}")
+            return cached
+
+        if cached and not revalidate and time.time() - cached.fetched_at < CACHE_TTL:
+            return cached
+
+        own_validators = bool(etag or last_modified)
+        if not own_validators and cached:
+            etag, last_modified = cached.etag, cached.last_modified
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        try:
+            response = self._request(url, headers)
+        except UpstreamOverloaded:
+            if cached:
+                logger.warning(f"Outbound capacity exhausted, serving cached copy of {url}")
+                return cached
+            raise
+        except requests.RequestException as e:
+            if cached:
+                logger.warning(f"Upstream unavailable for {url} ({e}), serving cached copy")
+                return cached
+            logger.error(f"Failed to fetch {url}: {e}")
+            return None
+
+        if response.status_code == 304 and own_validators:
+            if cached and cached.etag == etag and cached.last_modified == last_modified:
+                cached.fetched_at = self.cache.touch(url, entry)["fetched_at"]
+                cached.not_modified = True
+                return cached
+            return UpstreamResponse(url=url, data=None, content_hash=None, etag=etag, last_modified=last_modified,
+                                    fetched_at=time.time(), not_modified=True)
+
+        if response.status_code == 304 and cached:
+            entry = self.cache.touch(url, entry)
+            cached.fetched_at = entry["fetched_at"]
+            return cached
+
+        if response.status_code != 200:
+            logger.error(f"Failed to fetch {url}. Status code: {response.status_code}")
+            return None
+
+        try:
+            data = response.json()
+        except ValueError:
+            logger.error(f"Invalid JSON from {url}")
+            return None
+
+        entry = self.cache.store(url, response.content, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return UpstreamResponse(
+            url=url,
+            data=data,
+            content_hash=entry["hash"],
+            etag=entry["etag"],
+            last_modified=entry["last_modified"],
+            fetched_at=entry["fetched_at"]
+        )
+
+    def cached_names(self, endpoint: str) -> list[str]:
+        """Names of every resource under endpoint that can be replayed from the cache."""
+        prefix = f"{self.base_url}/{endpoint.strip('/')}/"
+        return [entry["url"][len(prefix):] for entry in self.cache.entries() if entry["url"].startswith(prefix)]
+
+
+client = UpstreamClient()